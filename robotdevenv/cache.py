@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import threading
+
+from robotdevenv.constants import LOCAL_CACHE_PATH
+
+
+class RobotDevCacheError(Exception): pass
+
+
+class RobotDevLocalCache:
+
+    def __init__(self,
+                name:str,
+                ttl:float=None,
+                private:bool=False,
+            ):
+        self.__path = LOCAL_CACHE_PATH / f'{name}.json'
+        self.__ttl = ttl
+        self.__private = private
+        self.__lock = threading.RLock()
+        self.__entries = None
+
+
+    def __load(self):
+        if self.__entries is not None:
+            return
+        try:
+            with open(self.__path, 'r') as file:
+                self.__entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.__entries = {}
+
+
+    def __save(self):
+        # Private caches (e.g. credentials) are only readable by the owner
+        if self.__private:
+            self.__path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            os.chmod(self.__path.parent, 0o700)
+            file_mode = 0o600
+        else:
+            self.__path.parent.mkdir(parents=True, exist_ok=True)
+            file_mode = 0o644
+        temp_path = self.__path.with_suffix(f'.{os.getpid()}.tmp')
+        file_descriptor = os.open(
+            temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, file_mode
+        )
+        with open(file_descriptor, 'w') as file:
+            json.dump(self.__entries, file, indent=2)
+        os.replace(temp_path, self.__path)
+
+
+    def get(self, key:str, default=None):
+        with self.__lock:
+            self.__load()
+            entry = self.__entries.get(key)
+            if entry is None:
+                return default
+            if (self.__ttl is not None) and \
+                    (time.time() - entry['timestamp'] > self.__ttl):
+                return default
+            return entry['value']
+
+
+    def set(self, key:str, value):
+        with self.__lock:
+            self.__load()
+            self.__entries[key] = {
+                'timestamp': time.time(),
+                'value': value,
+            }
+            self.__save()
+
+
+    def invalidate(self, key:str=None):
+        with self.__lock:
+            self.__load()
+            if key is None:
+                self.__entries = {}
+            else:
+                self.__entries.pop(key, None)
+            self.__save()
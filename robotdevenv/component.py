@@ -12,6 +12,7 @@ from robotdevenv.constants import ROBOT_COMPONENT_STATIC_DATA_PATH
 from robotdevenv.constants import ROBOT_COMPONENT_PERSISTENT_DATA_PATH
 from robotdevenv.constants import ROBOT_BUILD_PATH
 from robotdevenv.constants import ROBOT_SRC_PATH
+from robotdevenv.constants import ROBOT_CCACHE_PATH
 from robotdevenv.constants import FOLDER_SRC
 from robotdevenv.constants import FOLDER_BUILD
 from robotdevenv.constants import FOLDER_GENERIC_PERSISTENT_DATA
@@ -19,6 +20,7 @@ from robotdevenv.constants import FOLDER_COMPONENT_STATIC_DATA
 from robotdevenv.constants import FOLDER_COMPONENT_PERSISTENT_DATA
 from robotdevenv.constants import LOCAL_SRC_PATH
 from robotdevenv.constants import GLOBAL_BASE_PATH
+from robotdevenv.constants import GLOBAL_CCACHE_PATH
 
 
 class RobotDevComponentError(Exception): pass
@@ -177,8 +179,14 @@ class RobotDevComponent:
         self.container_name = container_name
 
 
+    def get_ccache_volume(self) -> tuple:
+        # Compiler cache folder, objects are only reusable in the same platform
+        return (GLOBAL_CCACHE_PATH / self.robot.platform, ROBOT_CCACHE_PATH)
+
+
     def get_volumes(self,
                 build_type=BuildImageType.DEVEL,
+                ccache=False,
             ):
 
         host_ws_path = self.robot.get_host_ws_path()
@@ -197,6 +205,9 @@ class RobotDevComponent:
         if(build_type==BuildImageType.DEVEL):
             volumes.append((dir_host_build_base, ROBOT_BUILD_PATH))
 
+        if ccache and build_type==BuildImageType.DEVEL:
+            volumes.append(self.get_ccache_volume())
+
         volumes.append((dir_host_generic_persistent_data, ROBOT_GENERIC_PERSISTENT_DATA_PATH))
 
         if(build_type==BuildImageType.DEVEL):
@@ -1,3 +1,4 @@
+import os
 import pathlib
 
 # GENERAL
@@ -11,6 +12,17 @@ CONTAINER_NAME_TEMPLATE = (
     '{repo}.{component}'
 )
 
+LABEL_INPUTS_DIGEST = 'robotdevenv.inputs_digest'
+BUILD_CACHE_TAG_SUFFIX = 'buildcache'
+LABEL_CONTAINER_FINGERPRINT = 'robotdevenv.fingerprint'
+
+# Warm containers stay alive between commands until they are idle
+WARM_CONTAINER_SUFFIX = '.warm'
+WARM_CONTAINER_IDLE_TIMEOUT = 30 * 60  # seconds
+WARM_CONTAINER_WATCHDOG_PERIOD = 30  # seconds
+WARM_CONTAINER_LAST_USE_PATH = '/tmp/robotdevenv.last_use'
+WARM_CONTAINER_EXECS_PATH = '/tmp/robotdevenv.execs'
+
 # GENERIC
 FOLDER_SRC = 'src'
 FOLDER_BUILD = 'build'
@@ -21,15 +33,24 @@ FOLDER_COMPONENTS = 'components'
 FOLDER_GENERIC_PERSISTENT_DATA = 'generic_persistent_data'
 FOLDER_COMPONENT_STATIC_DATA = 'component_static_data'
 FOLDER_COMPONENT_PERSISTENT_DATA = 'component_persistent_data'
+FOLDER_LOCAL_CACHE = 'local_cache'
+FOLDER_BUILD_CONTEXTS = 'build_contexts'
+FOLDER_IMAGE_TRANSFERS = 'image_transfers'
+FOLDER_CCACHE = 'ccache'
 
 # LOCAL
 DEV_ENV_PATH = pathlib.Path(__file__).resolve().parent.parent
 LOCAL_SRC_PATH = DEV_ENV_PATH / FOLDER_SRC
 FILE_ROBOTS_PATH = DEV_ENV_PATH / 'robots.yaml'
+LOCAL_CACHE_PATH = DEV_ENV_PATH / FOLDER_LOCAL_CACHE
 
 # GLOBAL
 GLOBAL_BASE_PATH = pathlib.Path('/opt') / COMPANY_NAME / ROBOT_NAME
 GLOBAL_CONFIG_PATH = GLOBAL_BASE_PATH / FOLDER_CONFIG
+# Compiler cache shared by the builds of all the components, per platform
+GLOBAL_CCACHE_PATH = GLOBAL_BASE_PATH / FOLDER_CCACHE
+# ccache evicts the least recently used entries above this size
+CCACHE_MAX_SIZE = '5G'
 
 # ROBOT (INSIDE CONTAINER)
 ROBOT_BASE_PATH = pathlib.Path('/robot')
@@ -41,20 +62,79 @@ ROBOT_CONFIG_PATH = ROBOT_BASE_PATH / FOLDER_CONFIG
 ROBOT_BUILD_PATH = ROBOT_BASE_PATH / FOLDER_BUILD
 ROBOT_SRC_PATH = ROBOT_BASE_PATH / FOLDER_SRC
 ROBOT_ROS_PKGS_PATH = ROBOT_SRC_PATH / FOLDER_ROS_PKGS
+ROBOT_CCACHE_PATH = ROBOT_BASE_PATH / FOLDER_CCACHE
 
 # DEPLOY
 DEPLOY_BRANCH = 'main'
 # DEPLOY_DEFAULT_BUILDING_HOST = 'localhost'
 DEPLOY_DEFAULT_BUILDING_HOST = 'JETSONTABLE001'
+# Concurrent component builds allowed per building host
+DEPLOY_BUILD_DEFAULT_MAX_JOBS = 2
+DEPLOY_BUILD_MAX_JOBS = {
+    'localhost': 4,
+}
+DEPLOY_PUSH_MAX_JOBS = 2
+# Builds import and export the BuildKit cache, so any building host reuses it
+DEPLOY_BUILD_CACHE = True
 GENERIC_PROD_DOCKERFILE = DEV_ENV_PATH / 'robotdevenv' / 'generic_dockerfiles' / 'production.dockerfile'
 
 # AWS Endpoints
-DEPLOY_DOCKER_REPO_ENDPOINT = '329599643140.dkr.ecr.us-east-1.amazonaws.com'
+# ROBOTDEVENV_REGISTRY_ENDPOINT allows using a local 'registry:2' for tests
+DEPLOY_DOCKER_REPO_ENDPOINT = os.environ.get(
+    'ROBOTDEVENV_REGISTRY_ENDPOINT',
+    '329599643140.dkr.ecr.us-east-1.amazonaws.com',
+)
 # DEPLOY_DOCKER_REPO_ENDPOINT = '608922983796.dkr.ecr.us-east-1.amazonaws.com'
 
+# REGISTRY
+REGISTRY_MAX_WORKERS = 8
+REGISTRY_REQUEST_TIMEOUT = 30  # seconds
+ECR_TOKEN_REFRESH_MARGIN = 15 * 60  # seconds before expiration
+PULL_MAX_WORKERS = 2
+IMAGE_TRANSFER_COMPRESS_LEVEL = 6
+# Filters the layers of the images in the source host of a transfer
+IMAGE_FILTER_SCRIPT = DEV_ENV_PATH / 'robotdevenv' / 'image_filter.py'
+
+# DISTRIBUTION
+# Robots pull from the peer registries over plain http, so
+# '<address>:PEER_REGISTRY_PORT' must be in their docker 'insecure-registries'
+PEER_REGISTRY_IMAGE = 'registry:2'
+PEER_REGISTRY_PORT = 5000
+PEER_REGISTRY_CONTAINER_NAME = 'robotdevenv.peer_registry'
+PEER_REGISTRY_START_TIMEOUT = 30  # seconds
+DISTRIBUTION_DEFAULT_SEEDS = 1
+DISTRIBUTION_DEFAULT_FANOUT = 2
+
+# REGISTRY MIRROR
+# Robots pulling from the mirror need '<address>:REGISTRY_MIRROR_PORT' in
+# their docker 'insecure-registries'
+REGISTRY_MIRROR_IMAGE = 'registry:2'
+REGISTRY_MIRROR_PORT = 5050
+REGISTRY_MIRROR_CONTAINER_NAME = 'robotdevenv.registry_mirror'
+REGISTRY_MIRROR_VOLUME_NAME = 'robotdevenv.registry_mirror'
+REGISTRY_MIRROR_START_TIMEOUT = 30  # seconds
+REGISTRY_MIRROR_REPLICATION_MAX_JOBS = 2
 
 # REMOTE HOST 
 REMOTE_HOST_WORKSPACES_FOLDER_NAME = 'dev_workspaces'
+REMOTE_DOCKER_SOCKET_PATH = '/var/run/docker.sock'
+REMOTE_WS_PATH_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+REMOTE_IMAGE_TRANSFERS_FOLDER_NAME = '.image_transfers'
+
+# SYNC
+SYNC_DEFAULT_MAX_WORKERS = 4
+SYNC_REMOTE_DIGESTS_FOLDER_NAME = '.sync_digests'
+SYNC_WATCH_DEBOUNCE = 0.3  # seconds
+
+# DIGESTS
+DIGEST_READ_CHUNK_SIZE = 1024 * 1024
+
+# FLEET
+FLEET_DEFAULT_MAX_WORKERS = 4
+
+# SSH
+SSH_CONTROL_FOLDER_NAME = 'robotdevenv'
+SSH_CONTROL_PERSIST = '10m'
 
 # ENVIRONMENT VARIABLES
 # ENV_CONFIG_PATH = 'ROBOT_CONFIGURATION_PATH'
@@ -3,10 +3,13 @@ import re
 import yaml
 import lxml
 import json
+import time
 import lxml.etree
 import argparse
 import paramiko
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 from robotdevenv.singleton import Singleton
 from robotdevenv.git import RobotDevRepositoryHandler as RepositoryHandler
@@ -14,12 +17,23 @@ from robotdevenv.robot import RobotDevRobot as Robot
 from robotdevenv.component import RobotDevComponent as Component
 from robotdevenv.docker import RobotDevDockerHandler as DockerHandler
 from robotdevenv.docker import BuildImageType
+from robotdevenv.docker import print_lock
 from robotdevenv.component import RobotDevComponentNotPlatform
+from robotdevenv.registry import RobotDevRegistryClient as RegistryClient
+from robotdevenv.registry import RobotDevRegistryError
+from robotdevenv.mirror import RobotDevRegistryMirror as RegistryMirror
+from robotdevenv.digest import get_human_size
+from robotdevenv.ros_packages import RobotDevROSPackageIndex as PackageIndex
+from robotdevenv.ros_packages import PACKAGE_XML_FILE_NAME
 
 from robotdevenv.constants import LOCAL_SRC_PATH
 from robotdevenv.constants import FOLDER_COMPONENTS
 from robotdevenv.constants import FILE_ROBOTS_PATH
 from robotdevenv.constants import DEPLOY_DEFAULT_BUILDING_HOST
+from robotdevenv.constants import DEPLOY_BUILD_MAX_JOBS
+from robotdevenv.constants import DEPLOY_BUILD_DEFAULT_MAX_JOBS
+from robotdevenv.constants import DEPLOY_PUSH_MAX_JOBS
+from robotdevenv.constants import DEPLOY_BUILD_CACHE
 
 
 class RobotDevDeployError(Exception):
@@ -34,6 +48,7 @@ class RobotDevDeployHandler(Singleton):
         parser: argparse.ArgumentParser = argparse.ArgumentParser()
         parser.add_argument('--repo', type=str, required=True)
         parser.add_argument('-s', '--skip-repo-steps', action='store_true')
+        parser.add_argument('--mirror', action='store_true')
 
         args = dict(parser.parse_known_args()[0]._get_kwargs())
         repo_name = args['repo']
@@ -49,6 +64,8 @@ class RobotDevDeployHandler(Singleton):
         # Public attributes
         self.repo_name = repo_name
         self.skip_repo_steps = args['skip_repo_steps']
+        self.use_mirror = args['mirror']
+        self.mirror: RegistryMirror = None
         self.last_version: str = None
         self.new_version: str = None
         self.build_host: str = None
@@ -114,8 +131,7 @@ class RobotDevDeployHandler(Singleton):
         if self.components_paths:
             self.ask_building_host()
             self.create_build_artifacts()
-            self.build_components()
-            self.push_components()
+            self.build_and_push_components()
 
         print('🎉🎉 Deploy Process Completed! 🎉🎉')
 
@@ -313,20 +329,12 @@ class RobotDevDeployHandler(Singleton):
 
     def update_packages_xml(self) -> None:
 
-        path = Path(self.repo_path)
-
-        # Get list of package xml files
-        list_path_packages_xml_files: list = []
-        for folder in path.iterdir():
-            if folder.is_dir() and not folder.name.endswith('.git') and \
-                    not folder.name.startswith('components') and \
-                    not folder.name.startswith('.vscode') and \
-                    not folder.name.startswith('.github'):
-                file_path = folder / 'package.xml'
-                if not file_path.exists():
-                    print(f'File \'{file_path}\' not found.')
-                    continue
-                list_path_packages_xml_files.append(folder / 'package.xml')
+        # Every package of the repo, nested ones included
+        packages = PackageIndex().get_packages_in(self.repo_path)
+        list_path_packages_xml_files: list = [
+            Path(package['path']) / PACKAGE_XML_FILE_NAME
+            for package in packages.values()
+        ]
 
         if len(list_path_packages_xml_files) == 0:
             return
@@ -445,9 +453,17 @@ class RobotDevDeployHandler(Singleton):
         self.components = []
         self.docker_handlers = []
 
+        if self.use_mirror:
+            self.mirror = RegistryMirror(self.robot)
+            self.mirror.ensure_running()
+
         print(f'🧩 Collecting components:')
         print()
 
+        prefix_width = max(
+            len(component_path.name) for component_path in self.components_paths
+        )
+
         for component_path in self.components_paths:
             component_name = component_path.name
             print(f'  - {component_name}: ', end='')
@@ -457,7 +473,10 @@ class RobotDevDeployHandler(Singleton):
                     robot=self.robot,
                 ))
                 self.docker_handlers.append(DockerHandler(
-                    component=self.components[-1], robot=self.robot
+                    component=self.components[-1],
+                    robot=self.robot,
+                    log_prefix=f'[{component_name.ljust(prefix_width)}] ',
+                    mirror=self.mirror,
                 ))
                 print('✅ OK.')
             except RobotDevComponentNotPlatform:
@@ -468,45 +487,177 @@ class RobotDevDeployHandler(Singleton):
                 continue
         print()
 
-    def build_components(self):
-        print(f'🛠️ Building components...')
-        print()
+    def __build_component(self, docker_handler: DockerHandler) -> float:
+        # Development and production images of a component are built in
+        # order, the production one uses the development one as base
+        component = docker_handler.component
+        start_time = time.monotonic()
 
-        for docker_handler in self.docker_handlers:
-            component = docker_handler.component
-            print()
-            print(f'🧩 Component: \'{component.full_name}\'')
-            print()
-            print(f'  Development image...')
-            print()
-            docker_handler.build_image(BuildImageType.DEVEL)
-            print(f'  Production image...')
-            print()
+        docker_handler.build_image(
+            BuildImageType.DEVEL,
+            cache=DEPLOY_BUILD_CACHE,
+            export_cache=DEPLOY_BUILD_CACHE,
+        )
 
-            metadata = {
-                'REPO_NAME': self.repo_name,
-                'COMPONENT_NAME': component.name,
-                'REPO_METADATA': json.dumps(self.manifest),
-                'COMPONENT_METADATA': json.dumps(component.component_desc),
-            }
+        metadata = {
+            'REPO_NAME': self.repo_name,
+            'COMPONENT_NAME': component.name,
+            'REPO_METADATA': json.dumps(self.manifest),
+            'COMPONENT_METADATA': json.dumps(component.component_desc),
+        }
+
+        docker_handler.build_image(
+            BuildImageType.PROD, metadata,
+            cache=DEPLOY_BUILD_CACHE,
+            export_cache=DEPLOY_BUILD_CACHE,
+        )
+
+        return time.monotonic() - start_time
+
+    def __push_component(self,
+                         docker_handler: DockerHandler,
+                         registry_digests: dict,
+                         ) -> tuple:
+        component = docker_handler.component
+        start_time = time.monotonic()
+        skipped_bytes = docker_handler.push_image(
+            BuildImageType.DEVEL,
+            registry_digests.get(component.image_name_dev),
+        )
+        skipped_bytes += docker_handler.push_image(
+            BuildImageType.PROD,
+            registry_digests.get(component.image_name_prod),
+        )
+        return start_time, time.monotonic(), skipped_bytes
+
+    def get_registry_digests(self) -> dict:
+        # Images already in the registry are looked up at once, so pushes of
+        # identical images can be skipped
+        images = []
+        for docker_handler in self.docker_handlers:
+            images.append(docker_handler.component.image_name_dev)
+            images.append(docker_handler.component.image_name_prod)
 
-            docker_handler.build_image(BuildImageType.PROD, metadata)
+        print(f'🔎 Checking images already in the registry...')
         print()
+        try:
+            return RegistryClient().get_images_digests(images)
+        except RobotDevRegistryError as e:
+            print(f'⚠️  Could not check the registry, pushing everything: {e}')
+            print()
+            return {}
+
+    def __get_intervals_length(self, intervals: list) -> float:
+        length = 0.0
+        current_start, current_end = None, None
+        for start, end in sorted(intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    length += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            length += current_end - current_start
+        return length
+
+    def build_and_push_components(self):
+        # Each component is pushed as soon as its images are built, while the
+        # rest of components are still building
+        max_build_jobs = DEPLOY_BUILD_MAX_JOBS.get(
+            self.build_host, DEPLOY_BUILD_DEFAULT_MAX_JOBS
+        )
 
-    def push_components(self):
-        print(f'⬆️  Pushing components...')
+        print(
+            f'🛠️ Building and pushing components ({max_build_jobs} builds and '
+            f'{DEPLOY_PUSH_MAX_JOBS} pushes at a time)...'
+        )
         print()
 
-        for docker_handler in self.docker_handlers:
-            component = docker_handler.component
-            print()
-            print(f'🧩 Component: \'{component.full_name}\'')
-            print()
-            print(f'  Development image...')
-            print()
-            docker_handler.push_image(BuildImageType.DEVEL)
+        registry_digests = self.get_registry_digests()
+
+        start_time = time.monotonic()
+        build_intervals = []
+        push_intervals = []
+        skipped_bytes = 0
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=max_build_jobs) as build_executor, \
+                ThreadPoolExecutor(max_workers=DEPLOY_PUSH_MAX_JOBS) as push_executor:
+
+            def build_task(docker_handler):
+                build_start_time = time.monotonic()
+                self.__build_component(docker_handler)
+                return build_start_time, time.monotonic()
+
+            build_futures = {
+                build_executor.submit(build_task, docker_handler):
+                    docker_handler
+                for docker_handler in self.docker_handlers
+            }
+            push_futures = {}
+
+            for future in as_completed(build_futures):
+                docker_handler = build_futures[future]
+                component = docker_handler.component
+                try:
+                    build_intervals.append(future.result())
+                    with print_lock:
+                        print(f'✅ Component \'{component.full_name}\' built')
+                except Exception as e:
+                    with print_lock:
+                        print(
+                            f'❌ Component \'{component.full_name}\' build '
+                            'failed'
+                        )
+                    errors.append(f'{component.full_name} (build): {e}')
+                    continue
+                push_futures[push_executor.submit(
+                    self.__push_component, docker_handler, registry_digests
+                )] = docker_handler
+
+            for future in as_completed(push_futures):
+                component = push_futures[future].component
+                try:
+                    push_start_time, push_end_time, push_skipped_bytes = \
+                        future.result()
+                    push_intervals.append((push_start_time, push_end_time))
+                    skipped_bytes += push_skipped_bytes
+                    with print_lock:
+                        print(f'✅ Component \'{component.full_name}\' pushed')
+                except Exception as e:
+                    with print_lock:
+                        print(
+                            f'❌ Component \'{component.full_name}\' push '
+                            'failed'
+                        )
+                    errors.append(f'{component.full_name} (push): {e}')
+
+        if self.mirror is not None:
+            errors += self.mirror.wait_replication()
+
+        total_time = time.monotonic() - start_time
+        build_time = self.__get_intervals_length(build_intervals)
+        push_time = self.__get_intervals_length(push_intervals)
+        overlap_time = build_time + push_time - \
+            self.__get_intervals_length(build_intervals + push_intervals)
+
+        # Building and pushing at the same time may slow both down, so the
+        # overlap is not necessarily time saved
+        with print_lock:
             print()
-            print(f'  Production image...')
+            print('⏱️  Build and push times:')
+            print(f'  - Total:               {total_time:7.0f}s')
+            print(f'  - Building:            {build_time:7.0f}s')
+            print(f'  - Pushing:             {push_time:7.0f}s')
+            print(f'  - Build/push overlap:  {overlap_time:7.0f}s')
+            print(f'  - Pushes skipped:      {get_human_size(skipped_bytes)}')
             print()
-            docker_handler.push_image(BuildImageType.PROD)
-        print()
+
+        if self.mirror is not None:
+            self.mirror.print_stats()
+
+        if errors:
+            raise RobotDevDeployError(
+                'Build and push failed:\n' + '\n'.join(errors)
+            )
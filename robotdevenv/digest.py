@@ -0,0 +1,189 @@
+import os
+import re
+import pathlib
+import hashlib
+
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+
+from robotdevenv.constants import DIGEST_READ_CHUNK_SIZE
+
+
+class RobotDevDigestError(Exception): pass
+
+
+def get_file_digest(path:pathlib.Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DIGEST_READ_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_manifest_digest(manifest:dict) -> str:
+    manifest_hash = hashlib.sha256()
+    for relative_path in sorted(manifest):
+        manifest_hash.update(
+            f'{relative_path}\0{manifest[relative_path]}\n'.encode()
+        )
+    return manifest_hash.hexdigest()
+
+
+def get_tree_size(root_path:pathlib.Path) -> str:
+    size = 0
+    for dir_path, _, file_names in os.walk(root_path):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if not os.path.islink(path):
+                size += os.path.getsize(path)
+    return get_human_size(size)
+
+
+def get_human_size(size:float) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}TB'
+
+
+def get_manifest_changes(old_manifest:dict, new_manifest:dict) -> list:
+    changes = [
+        path for path, digest in new_manifest.items()
+        if old_manifest.get(path) != digest
+    ]
+    changes += [path for path in old_manifest if path not in new_manifest]
+    changes.sort()
+    return changes
+
+
+class RobotDevDockerIgnore:
+
+    def __init__(self,
+                context_path:pathlib.Path,
+                dockerfile_path:pathlib.Path=None,
+            ):
+        # BuildKit gives priority to '<dockerfile>.dockerignore'
+        ignore_paths = [context_path / '.dockerignore']
+        if dockerfile_path is not None:
+            ignore_paths.insert(
+                0, dockerfile_path.with_name(f'{dockerfile_path.name}.dockerignore')
+            )
+
+        patterns = []
+        for ignore_path in ignore_paths:
+            if not ignore_path.is_file():
+                continue
+            with open(ignore_path, 'r') as file:
+                for line in file:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        patterns.append(line)
+            break
+
+        self.patterns = [self.__compile(pattern) for pattern in patterns]
+        self.has_exceptions = any(negated for negated, _ in self.patterns)
+
+
+    def __compile(self, pattern:str):
+        negated = pattern.startswith('!')
+        pattern = os.path.normpath(pattern.lstrip('!').strip()).lstrip('/')
+        regex = ''
+        index = 0
+        while index < len(pattern):
+            if pattern.startswith('**/', index):
+                regex += '(.*/)?'
+                index += 3
+            elif pattern.startswith('**', index):
+                regex += '.*'
+                index += 2
+            elif pattern[index] == '*':
+                regex += '[^/]*'
+                index += 1
+            elif pattern[index] == '?':
+                regex += '[^/]'
+                index += 1
+            else:
+                regex += re.escape(pattern[index])
+                index += 1
+        return negated, re.compile(regex)
+
+
+    def is_ignored(self, relative_path:str) -> bool:
+        # A pattern matching a folder also matches everything inside it, and
+        # the last matching pattern wins
+        parts = relative_path.split('/')
+        candidates = ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+        ignored = False
+        for negated, regex in self.patterns:
+            if any(regex.fullmatch(candidate) for candidate in candidates):
+                ignored = not negated
+        return ignored
+
+
+class RobotDevTreeDigest:
+
+    def __init__(self,
+                root_path:pathlib.Path,
+                cache_name:str,
+                docker_ignore:RobotDevDockerIgnore=None,
+            ):
+        self.root_path = root_path
+        self.__docker_ignore = docker_ignore
+        self.__stats_cache = LocalCache(f'tree_digests/{cache_name}')
+
+
+    def __is_ignored(self, relative_path:str) -> bool:
+        return (self.__docker_ignore is not None) and \
+            self.__docker_ignore.is_ignored(relative_path)
+
+
+    def get_manifest(self) -> dict:
+        if not self.root_path.is_dir():
+            raise RobotDevDigestError(f'Folder \'{self.root_path}\' not found.')
+
+        # Digests are only recomputed for files whose mtime or size changed
+        old_stats:dict = self.__stats_cache.get('files', {})
+        new_stats = {}
+        manifest = {}
+
+        for dir_path, dir_names, file_names in os.walk(self.root_path):
+            dir_path = pathlib.Path(dir_path)
+            # Ignored folders can be skipped only without exception patterns
+            if (self.__docker_ignore is not None) and \
+                    (not self.__docker_ignore.has_exceptions):
+                dir_names[:] = [
+                    name for name in dir_names if not self.__is_ignored(
+                        str((dir_path / name).relative_to(self.root_path))
+                    )
+                ]
+            # Symlinks to folders are not followed, rsync copies them as links
+            entries = file_names + [
+                name for name in dir_names if (dir_path / name).is_symlink()
+            ]
+            for name in entries:
+                path = dir_path / name
+                relative_path = str(path.relative_to(self.root_path))
+                if self.__is_ignored(relative_path):
+                    continue
+                stat = path.lstat()
+
+                old_stat = old_stats.get(relative_path)
+                if old_stat is not None and \
+                        old_stat[0] == stat.st_mtime_ns and \
+                        old_stat[1] == stat.st_size:
+                    digest = old_stat[2]
+                elif path.is_symlink():
+                    digest = hashlib.sha256(
+                        f'link:{os.readlink(path)}'.encode()
+                    ).hexdigest()
+                else:
+                    digest = get_file_digest(path)
+
+                new_stats[relative_path] = \
+                    [stat.st_mtime_ns, stat.st_size, digest]
+                manifest[relative_path] = digest
+
+        if new_stats != old_stats:
+            self.__stats_cache.set('files', new_stats)
+
+        return manifest
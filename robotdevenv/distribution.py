@@ -0,0 +1,189 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from robotdevenv.component import RobotDevComponent as Component
+from robotdevenv.robot import RobotDevRobot as Robot
+from robotdevenv.docker import RobotDevDockerHandler as DockerHandler
+from robotdevenv.digest import get_human_size
+
+from robotdevenv.constants import DEPLOY_DOCKER_REPO_ENDPOINT
+from robotdevenv.constants import PEER_REGISTRY_PORT
+from robotdevenv.constants import PULL_MAX_WORKERS
+from robotdevenv.constants import DISTRIBUTION_DEFAULT_SEEDS
+from robotdevenv.constants import DISTRIBUTION_DEFAULT_FANOUT
+
+
+class RobotDevDistributionError(Exception): pass
+
+
+class RobotDevImageDistributor:
+
+    def __init__(self,
+                component_name:str,
+                robot_names:list,
+                version:str=None,
+                seeds:int=DISTRIBUTION_DEFAULT_SEEDS,
+                fanout:int=DISTRIBUTION_DEFAULT_FANOUT,
+                max_workers:int=PULL_MAX_WORKERS,
+            ):
+        if (seeds < 1) or (fanout < 1):
+            raise RobotDevDistributionError(
+                'Seeds and fan-out must be at least 1.'
+            )
+
+        width = max(len(name) for name in robot_names)
+        handlers = {}
+        for name in robot_names:
+            robot = Robot(name=name)
+            component = Component(full_name=component_name, robot=robot)
+            handlers[name] = DockerHandler(
+                component, robot, log_prefix=f'[{name.ljust(width)}] '
+            )
+
+        # Images are per platform, so each platform is a separate tree
+        platforms = {}
+        for name, handler in handlers.items():
+            platforms.setdefault(handler.robot.platform, []).append(name)
+
+        # Private attributes
+        self.__handlers = handlers
+        self.__platforms = platforms
+        self.__version = version
+        self.__seeds = seeds
+        self.__fanout = fanout
+        self.__max_workers = max_workers
+        self.__width = width
+
+
+    def __pull(self, name:str, source:str, version:str, serve:bool):
+        # Pulls from the registry if 'source' is None, or from the peer
+        # registry in 'source'. Then serves the images to other robots.
+        handler = self.__handlers[name]
+        if source is None:
+            endpoint = DEPLOY_DOCKER_REPO_ENDPOINT
+        else:
+            endpoint = \
+                f'{self.__handlers[source].robot.address}:{PEER_REGISTRY_PORT}'
+
+        start_time = time.monotonic()
+        results = handler.pull_images(
+            version,
+            max_workers=self.__max_workers,
+            endpoint=endpoint,
+            missing_bytes=self.__estimates[name],
+        )
+        success = all(result[0] for result in results.values())
+        duration = time.monotonic() - start_time
+
+        if success and serve:
+            serving = handler.start_peer_registry(list(results))
+        else:
+            serving = False
+        return success, duration, serving
+
+
+    def __distribute_platform(self, names:list) -> dict:
+        version = self.__version
+        if version is None:
+            version = self.__handlers[names[0]].component.version_prod
+
+        # What every robot would pull from the registry on its own
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            estimates = executor.map(
+                lambda name: self.__handlers[name].get_pull_estimate(version),
+                names,
+            )
+        self.__estimates.update(zip(names, estimates))
+
+        results = {}
+        sources = []
+        pending = list(names)
+        try:
+            while pending:
+                # Every serving robot feeds 'fanout' robots per round, the
+                # registry only feeds the seeds (or anyone if no peer is
+                # serving)
+                if sources:
+                    assignments = [
+                        (pending.pop(0), source)
+                        for source in sources for _ in range(self.__fanout)
+                        if pending
+                    ]
+                else:
+                    assignments = [
+                        (pending.pop(0), None)
+                        for _ in range(self.__seeds) if pending
+                    ]
+                serve = bool(pending)
+
+                with ThreadPoolExecutor(
+                            max_workers=len(assignments)
+                        ) as executor:
+                    futures = {
+                        name: executor.submit(
+                            self.__pull, name, source, version, serve
+                        )
+                        for name, source in assignments
+                    }
+
+                for name, source in assignments:
+                    success, duration, serving = futures[name].result()
+                    results[name] = (source, success, duration)
+                    if serving:
+                        sources.append(name)
+        finally:
+            for name in sources:
+                self.__handlers[name].stop_peer_registry()
+
+        return results
+
+
+    def distribute(self):
+        self.__estimates = {}
+        results = {}
+        for platform, names in self.__platforms.items():
+            print(f'🌳 Distributing \'{platform}\' images to '
+                  f'{len(names)} robots...')
+            print()
+            results.update(self.__distribute_platform(names))
+
+        def get_bytes(name):
+            return sum(
+                size for size in self.__estimates[name].values()
+                if size is not None
+            )
+
+        uplink_bytes = sum(
+            get_bytes(name) for name, (source, _, _) in results.items()
+            if source is None
+        )
+        naive_bytes = sum(get_bytes(name) for name in results)
+        unknown = [
+            name for name in results
+            if None in self.__estimates[name].values()
+        ]
+
+        print()
+        print('📋 Distribution summary:')
+        print()
+        failed = []
+        for name, (source, success, duration) in results.items():
+            status = '✅ OK    ' if success else '❌ FAILED'
+            origin = 'registry' if source is None else source
+            print(
+                f'  [{name.ljust(self.__width)}] {status} {duration:7.1f}s  '
+                f'{get_human_size(get_bytes(name)).rjust(9)} from {origin}'
+            )
+            if not success:
+                failed.append(name)
+        print()
+        print(f'  📶 Uplink: {get_human_size(uplink_bytes)} '
+              f'(naive pull: {get_human_size(naive_bytes)})')
+        if unknown:
+            print(f'  ⚠️  Unknown sizes for: {", ".join(unknown)}')
+        print()
+
+        if failed:
+            raise RobotDevDistributionError(
+                f'Distribution failed in robots: {", ".join(failed)}'
+            )
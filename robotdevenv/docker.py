@@ -1,37 +1,118 @@
-import subprocess
+import re
+import time
 import json
 import boto3
-import base64
+import shlex
+import shutil
+import hashlib
+import pathlib
+import threading
 import subprocess
 from datetime import datetime
 import logging
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
 from botocore.exceptions import TokenRetrievalError
 
 from robotdevenv.component import RobotDevComponent as Component
 from robotdevenv.robot import RobotDevRobot as Robot
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+from robotdevenv.digest import RobotDevTreeDigest as TreeDigest
+from robotdevenv.digest import RobotDevDockerIgnore as DockerIgnore
+from robotdevenv.digest import get_file_digest
+from robotdevenv.digest import get_manifest_digest
+from robotdevenv.digest import get_tree_size
+from robotdevenv.digest import get_human_size
+from robotdevenv.registry import get_ecr_authorization
+from robotdevenv.registry import get_cached_ecr_authorization
+from robotdevenv.registry import set_ecr_docker_logged_in
+from robotdevenv.registry import set_ecr_host_logged_in
+from robotdevenv.registry import is_ecr_logged_in
+from robotdevenv.registry import is_ecr_auth_error
+from robotdevenv.registry import invalidate_ecr_authorization
+from robotdevenv.registry import is_ecr_endpoint
+from robotdevenv.registry import get_chain_ids
+from robotdevenv.registry import split_image_reference
+from robotdevenv.registry import RobotDevRegistryClient as RegistryClient
+from robotdevenv.registry import RobotDevRegistryError
+from robotdevenv.mirror import RobotDevRegistryMirror as RegistryMirror
+from robotdevenv.ssh import RobotDevSSHError as SSHError
+from robotdevenv.ssh import RobotDevRSyncError as RSyncError
 
 from robotdevenv.constants import DEV_ENV_PATH
 from robotdevenv.constants import FOLDER_SRC
+from robotdevenv.constants import FOLDER_COMPONENTS
+from robotdevenv.constants import FOLDER_COMMANDS
+from robotdevenv.constants import FOLDER_COMPONENT_STATIC_DATA
+from robotdevenv.constants import FOLDER_BUILD_CONTEXTS
+from robotdevenv.constants import FOLDER_IMAGE_TRANSFERS
+from robotdevenv.constants import LOCAL_SRC_PATH
+from robotdevenv.constants import LOCAL_CACHE_PATH
 from robotdevenv.constants import DEPLOY_DOCKER_REPO_ENDPOINT
 from robotdevenv.constants import GENERIC_PROD_DOCKERFILE
+from robotdevenv.constants import LABEL_INPUTS_DIGEST
+from robotdevenv.constants import BUILD_CACHE_TAG_SUFFIX
+from robotdevenv.constants import LABEL_CONTAINER_FINGERPRINT
+from robotdevenv.constants import WARM_CONTAINER_SUFFIX
+from robotdevenv.constants import WARM_CONTAINER_IDLE_TIMEOUT
+from robotdevenv.constants import WARM_CONTAINER_WATCHDOG_PERIOD
+from robotdevenv.constants import WARM_CONTAINER_LAST_USE_PATH
+from robotdevenv.constants import WARM_CONTAINER_EXECS_PATH
+from robotdevenv.constants import PULL_MAX_WORKERS
+from robotdevenv.constants import IMAGE_TRANSFER_COMPRESS_LEVEL
+from robotdevenv.constants import IMAGE_FILTER_SCRIPT
+from robotdevenv.constants import PEER_REGISTRY_IMAGE
+from robotdevenv.constants import PEER_REGISTRY_PORT
+from robotdevenv.constants import PEER_REGISTRY_CONTAINER_NAME
+from robotdevenv.constants import PEER_REGISTRY_START_TIMEOUT
+from robotdevenv.constants import REMOTE_IMAGE_TRANSFERS_FOLDER_NAME
 
 logger = logging.getLogger(__name__)
 
+build_durations_cache = LocalCache('build_durations')
+build_cache_stats_cache = LocalCache('build_cache_stats')
+launch_times_cache = LocalCache('container_launch_times')
+print_lock = threading.Lock()
+
+class RobotDevDockerError(Exception): pass
+
+
 class BuildImageType(IntEnum):
     DEVEL = 0
     PROD = 1
 
 
+class RobotDevContainerInfo:
+
+    def __init__(self, inspect_info: dict):
+        image = inspect_info['Config']['Image']
+        image_name, tag = split_image_reference(image)
+
+        self.name: str = inspect_info['Name'].lstrip('/')
+        self.image: str = image
+        self.image_name: str = image_name
+        self.tag: str = tag
+        self.image_id: str = inspect_info['Image']
+        self.state: str = inspect_info['State']['Status']
+        self.running: bool = inspect_info['State']['Running']
+        self.labels: dict = inspect_info['Config'].get('Labels') or {}
+        self.inspect_info: dict = inspect_info
+
+
 class RobotDevDockerHandler:
 
     def __init__(self,
                  component: Component,
                  robot: Robot,
+                 log_prefix: str = '',
+                 mirror: RegistryMirror = None,
                  ):
         self.component: Component = component
         self.robot: Robot = robot
+        self.log_prefix: str = log_prefix
+        # Registry mirror running in 'robot', used for base images and pushes
+        self.mirror: RegistryMirror = mirror
         # self.aws_logged_in = self.aws_is_logged_in()
         self.aws_logged_in = False
 
@@ -49,6 +130,10 @@ class RobotDevDockerHandler:
 
 
     def aws_is_logged_in(self):
+        # A valid cached ECR token means that the AWS session is valid
+        if get_cached_ecr_authorization() is not None:
+            logging.info("Using cached ECR authorization")
+            return True
         try:
             try:
                 result = boto3.client('sts').get_caller_identity()
@@ -72,16 +157,15 @@ class RobotDevDockerHandler:
 
 
     def aws_login_ecr(self):
-        print('Logging into AWS ECR...')
-        erc_client = boto3.client(service_name='ecr')
-        response = erc_client.get_authorization_token()
-
-        authorization_data = response['authorizationData'][0]
-        token = authorization_data['authorizationToken']
-        registry_url = authorization_data['proxyEndpoint']
+        authorization = get_ecr_authorization()
+        if is_ecr_logged_in(authorization):
+            self.aws_logged_in = True
+            return
 
-        username, password = base64.b64decode(token)\
-            .decode('utf-8').split(':')
+        print('Logging into AWS ECR...')
+        username = authorization['username']
+        password = authorization['password']
+        registry_url = authorization['registry_url']
         logger.info("Logging in to AWS ECR")
         command = (
             f'docker login --username {username} --password {password} '
@@ -100,14 +184,390 @@ class RobotDevDockerHandler:
             print(e.stdout.decode())
             print(e.stderr.decode())
             raise e
+        set_ecr_docker_logged_in()
         self.aws_logged_in = True
         print('Success\n')
 
 
+    def aws_login_ecr_build_host(self):
+        # Remote-resident builds run with the docker client of the host, which
+        # does not share the credentials of the local client
+        authorization = get_ecr_authorization()
+        if is_ecr_logged_in(authorization, self.robot.name):
+            return
+
+        self.__log(f'Logging into AWS ECR in \'{self.robot.name}\'...')
+        remote_command = (
+            f'docker login --username {authorization["username"]} '
+            f'--password-stdin {authorization["registry_url"]}'
+        )
+        process = subprocess.run(
+            f'{self.robot.ssh_handler.get_ssh_command()} {self.robot.name} '
+            f'{shlex.quote(remote_command)}',
+            shell=True,
+            input=authorization['password'],
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise RobotDevDockerError(
+                f'Could not log into AWS ECR in \'{self.robot.name}\': '
+                f'{process.stderr.strip()}'
+            )
+        set_ecr_host_logged_in(self.robot.name)
+        self.__log('Success')
+        self.__log()
+
+
+    def __get_docker_output(self, docker_args:str):
+        docker_command = ''
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} '
+        docker_command += f'docker {docker_args}'
+
+        process = subprocess.run(
+            docker_command,
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            return None
+        return process.stdout.strip()
+
+    def __log(self, message: str = '', prefix: str = ''):
+        # Several handlers may build at the same time, so every line is
+        # printed at once and tagged with the handler prefix
+        with print_lock:
+            for line in str(message).split('\n'):
+                print(f'{self.log_prefix}{prefix}{line}', flush=True)
+
+    def __run_streamed(self, command: str, prefix: str = '') -> str:
+        # Runs a shell command printing its output while it is produced and
+        # returns the whole output
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        output_lines = []
+        for line in process.stdout:
+            self.__log(line.rstrip('\n'), prefix)
+            output_lines.append(line)
+        process.wait()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, command, output=''.join(output_lines),
+            )
+        return ''.join(output_lines)
+
+    def __run_streamed_logged_in(self,
+                                 command: str,
+                                 endpoint: str,
+                                 prefix: str = '',
+                                 ) -> str:
+        # A rejected ECR login is dropped and the command is retried once
+        # with a new token
+        try:
+            return self.__run_streamed(command, prefix)
+        except subprocess.CalledProcessError as e:
+            if not (is_ecr_endpoint(endpoint) and is_ecr_auth_error(e.output)):
+                raise
+        self.__log('⚠️  AWS ECR login rejected, logging in again', prefix)
+        invalidate_ecr_authorization()
+        self.aws_logged_in = False
+        self.aws_login_ecr()
+        return self.__run_streamed(command, prefix)
+
+    def __prepare_prod_context(self):
+        # Only the repos in 'src' and the component commands and static data
+        # are used by the generic production dockerfile
+        context_path = LOCAL_CACHE_PATH / FOLDER_BUILD_CONTEXTS / \
+            f'{self.component.repo_name}.{self.component.name}'
+        context_path.mkdir(parents=True, exist_ok=True)
+
+        component_folders = [
+            pathlib.Path(self.component.repo_name) / FOLDER_COMPONENTS /
+                self.component.name / folder
+            for folder in [FOLDER_COMMANDS, FOLDER_COMPONENT_STATIC_DATA]
+        ]
+        if self.component.repo_name in self.component.src:
+            context_entries = list(self.component.src)
+        else:
+            context_entries = list(self.component.src) + component_folders
+
+        top_level_entries = {
+            pathlib.Path(entry).parts[0] for entry in context_entries
+        }
+        for path in context_path.iterdir():
+            if path.name not in top_level_entries:
+                if path.is_dir() and not path.is_symlink():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+
+        self.__log(f'📦 Preparing production build context: \'{context_path}\'')
+        for entry in context_entries:
+            origin_path = LOCAL_SRC_PATH / entry
+            if not origin_path.exists():
+                continue
+            destination_path = context_path / entry
+            destination_path.parent.mkdir(parents=True, exist_ok=True)
+            subprocess.run(
+                'rsync --archive --delete --exclude=.git '
+                f'{origin_path}/ {destination_path}/',
+                shell=True,
+                check=True,
+            )
+        self.__log()
+
+        return context_path
+
+    def __get_remote_build_command(self,
+                                   build_type: BuildImageType,
+                                   context_path: pathlib.Path,
+                                   dockerfile: pathlib.Path,
+                                   docker_builds: list,
+                                   docker_build_env: str = '',
+                                   ) -> list:
+        # Returns a command for each item of 'docker_builds', the arguments
+        # of a 'docker build' run.
+        # The context is kept up to date in the host, so the build does not
+        # stream it through SSH. Files already synced to the workspace are
+        # copied in the host instead of being transferred again.
+        ssh_handler = self.robot.ssh_handler
+        host_ws_path = self.robot.get_host_ws_path()
+        remote_contexts_path = host_ws_path / FOLDER_BUILD_CONTEXTS
+        context_name = (
+            f'{self.component.repo_name}.{self.component.name}.'
+            f'{build_type.name.lower()}'
+        )
+        remote_context_path = remote_contexts_path / context_name
+
+        if context_path == self.component.local_path:
+            copy_dest_path = self.component.host_path
+        else:
+            copy_dest_path = host_ws_path / FOLDER_SRC
+
+        self.__log(
+            f'🔁 Updating build context in \'{self.robot.name}\': '
+            f'\'{remote_context_path}\''
+        )
+        ssh_handler.run_remote(f'mkdir -p {remote_context_path}')
+        ssh_handler.sync_to_remote(
+            origin_path=f'{context_path}/',
+            destination_path=remote_context_path,
+            copy_dest_path=copy_dest_path,
+        )
+
+        remote_dockerfile = remote_contexts_path / f'{context_name}.dockerfile'
+        ssh_handler.sync_to_remote(
+            origin_path=dockerfile,
+            destination_path=remote_dockerfile,
+        )
+        dockerignore = dockerfile.with_name(f'{dockerfile.name}.dockerignore')
+        if dockerignore.is_file():
+            ssh_handler.sync_to_remote(
+                origin_path=dockerignore,
+                destination_path=f'{remote_dockerfile}.dockerignore',
+            )
+        self.__log()
+
+        return [
+            f'{ssh_handler.get_ssh_command()} {self.robot.name} ' +
+            shlex.quote(
+                f'{docker_build_env}docker build {docker_build_args}'
+                f'-f {remote_dockerfile} {remote_context_path}'
+            )
+            for docker_build_args in docker_builds
+        ]
+
+    def __get_base_images(self, dockerfile, build_args: dict):
+        with open(dockerfile, 'r') as file:
+            lines = file.read().replace('\\\n', ' ').splitlines()
+
+        args = dict(build_args)
+        stages = set()
+        base_images = []
+
+        def substitute(match):
+            return str(args.get(match.group(1), ''))
+
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            instruction = words[0].upper()
+
+            # Only the ARGs before the first FROM can be used in FROM lines
+            if instruction == 'ARG' and not stages and not base_images:
+                for word in words[1:]:
+                    name, _, default = word.partition('=')
+                    if name not in build_args:
+                        args[name] = default.strip('\'"')
+
+            elif instruction == 'FROM':
+                words = [word for word in words[1:] if not word.startswith('--')]
+                image = re.sub(r'\$\{?(\w+)\}?', substitute, words[0])
+                if (image.lower() not in stages) and (image != 'scratch') \
+                        and (image not in base_images):
+                    base_images.append(image)
+                if len(words) >= 3 and words[1].upper() == 'AS':
+                    stages.add(words[2].lower())
+
+        return base_images
+
+    def __get_build_inputs_digest(self,
+                                  build_type: BuildImageType,
+                                  context_path,
+                                  dockerfile,
+                                  build_args: dict,
+                                  ):
+        inputs_hash = hashlib.sha256()
+        inputs_hash.update(get_file_digest(dockerfile).encode())
+
+        context_manifest = TreeDigest(
+            context_path,
+            cache_name=(
+                f'build_context.{self.component.repo_name}.'
+                f'{self.component.name}.{build_type.name.lower()}'
+            ),
+            docker_ignore=DockerIgnore(context_path, dockerfile),
+        ).get_manifest()
+        inputs_hash.update(get_manifest_digest(context_manifest).encode())
+
+        inputs_hash.update(
+            json.dumps(build_args, sort_keys=True, default=str).encode()
+        )
+
+        # Missing base images are pulled now instead of by the build, so the
+        # digest of the first build matches the one of the next runs
+        for base_image in self.__get_base_images(dockerfile, build_args):
+            inspect_args = f'image inspect --format \'{{{{.Id}}}}\' {base_image}'
+            base_image_id = self.__get_docker_output(inspect_args)
+            if base_image_id is None:
+                self.__log(f'⬇️  Pulling base image \'{base_image}\'')
+                self.__get_docker_output(f'pull --quiet {base_image}')
+                base_image_id = self.__get_docker_output(inspect_args)
+            if base_image_id is None:
+                # The build will fail or resolve it, it is not an input yet
+                continue
+            inputs_hash.update(f'{base_image}={base_image_id}'.encode())
+
+        return inputs_hash.hexdigest()
+
+    def __get_build_cache_ref(self,
+                              build_type: BuildImageType,
+                              stage: str = None,
+                              ) -> str:
+        if self.mirror is not None:
+            endpoint = self.mirror.endpoint
+        else:
+            endpoint = DEPLOY_DOCKER_REPO_ENDPOINT
+        cache_ref = (
+            f'{endpoint}/{self.component.image_name_base}.'
+            f'{BUILD_CACHE_TAG_SUFFIX}.{build_type.name.lower()}'
+        )
+        if stage is not None:
+            cache_ref += f'.{stage}'
+        return cache_ref
+
+    def __get_intermediate_stages(self, dockerfile) -> list:
+        # Named stages before the final one, in order
+        with open(dockerfile, 'r') as file:
+            lines = file.read().replace('\\\n', ' ').splitlines()
+        stages = []
+        for line in lines:
+            words = [word for word in line.split() if not word.startswith('--')]
+            if words and words[0].upper() == 'FROM':
+                if len(words) >= 4 and words[2].upper() == 'AS':
+                    stages.append(words[3].lower())
+                else:
+                    stages.append(None)
+        return [stage for stage in stages[:-1] if stage is not None]
+
+    def __get_build_steps(self, build_output: str) -> list:
+        # Steps of a BuildKit plain progress output, as (name, cached) tuples
+        steps = {}
+        cached = set()
+        for line in build_output.splitlines():
+            header = re.match(r'#(\d+) \[([^\]]+)\] (.*)$', line)
+            if header is not None:
+                stage, instruction = header.group(2), header.group(3)
+                if stage.startswith(('internal', 'auth')) or \
+                        instruction.startswith('FROM'):
+                    continue
+                steps.setdefault(
+                    header.group(1), f'[{stage}] {instruction}'[:80]
+                )
+            elif re.match(r'#\d+ CACHED$', line):
+                cached.add(line.split()[0][1:])
+        return [(name, step_id in cached) for step_id, name in steps.items()]
+
+    def __report_build_cache(self, build_type: BuildImageType, build_outputs: list):
+        # Steps repeated by later builds were already reported by the
+        # first build that run them
+        steps = {}
+        for build_output in build_outputs:
+            for name, cached in self.__get_build_steps(build_output):
+                steps.setdefault(name, cached)
+        steps = list(steps.items())
+        if not steps:
+            self.__log('⚠️  No BuildKit steps found, cache hits are unknown.')
+            self.__log()
+            return
+
+        # Hits of each step are accumulated between builds
+        cache_key = f'{self.component.image_name_base}.{build_type.name.lower()}'
+        history = build_cache_stats_cache.get(cache_key, {})
+        self.__log('🧊 Build cache:')
+        for name, cached in steps:
+            hits, builds = history.get(name, [0, 0])
+            history[name] = [hits + int(cached), builds + 1]
+            status = '✅ cached' if cached else '🔨 built '
+            self.__log(
+                f'  {status} {name} '
+                f'({history[name][0]}/{history[name][1]} hits)'
+            )
+        build_cache_stats_cache.set(cache_key, history)
+
+        hits = sum(1 for _, cached in steps if cached)
+        self.__log(f'  Hit rate: {hits}/{len(steps)} steps '
+                   f'({100 * hits / len(steps):.0f}%)')
+        self.__log()
+
+    def __export_build_cache(self, cache_images: list):
+        # 'cache_images' are (tag, cache reference) tuples. The image layers
+        # are already in the host, so this only pushes the layers that are
+        # not in the registry.
+        if self.robot.is_local:
+            ssh_prefix = ''
+        else:
+            ssh_prefix = f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()}'
+
+        for tag, cache_ref in cache_images:
+            self.__log(f'🧊 Exporting build cache to \'{cache_ref}\'...')
+            try:
+                self.__run_streamed(
+                    f'{ssh_prefix} docker tag {tag} {cache_ref} && '
+                    f'{ssh_prefix} docker push {cache_ref} && '
+                    f'{ssh_prefix} docker rmi {cache_ref}'
+                )
+            except subprocess.CalledProcessError as e:
+                self.__log(f'⚠️  Could not export the build cache: {e}')
+        self.__log()
+
     def build_image(self,
                     build_type: BuildImageType,
                     metadata={},
                     verbose=False,
+                    force=False,
+                    remote_context=False,
+                    cache=False,
+                    export_cache=False,
                     ):
 
         # self.aws_login_ecr()
@@ -117,212 +577,696 @@ class RobotDevDockerHandler:
             tag = self.component.image_name_dev
             dockerfile = self.component.dockerfile_path
         elif build_type == BuildImageType.PROD:
-            docker_build_context_path = DEV_ENV_PATH / FOLDER_SRC
             tag = self.component.image_name_prod
             if self.component.dockerfile_prod_path is None:
                 dockerfile = GENERIC_PROD_DOCKERFILE
+                docker_build_context_path = self.__prepare_prod_context()
             else:
+                # Custom production dockerfiles may use any file in src
                 dockerfile = self.component.dockerfile_prod_path
+                docker_build_context_path = DEV_ENV_PATH / FOLDER_SRC
 
-        print(f'🛠️  Building component image: \'{tag}\'')
-        print(f'            from dockerfile: \'{dockerfile}\'')
-        print()
+        self.__log(f'🛠️  Building component image: \'{tag}\'')
+        self.__log(f'            from dockerfile: \'{dockerfile}\'')
+        self.__log()
 
-        docker_build_command = f'cd {DEV_ENV_PATH} && '
+        if self.mirror is not None:
+            registry_endpoint = self.mirror.endpoint
+        else:
+            registry_endpoint = DEPLOY_DOCKER_REPO_ENDPOINT
+
+        build_args = {
+            'REGISTRY_ENDPOINT': registry_endpoint,
+            'REPOS_LIST': " ".join(self.component.src),
+            'PACKAGES_LIST': " ".join(self.component.ros_pkgs),
+        }
+        build_args.update(metadata)
+        if build_type == BuildImageType.PROD:
+            build_args['FROM'] = self.component.image_name_dev
+
+        # Base images from the registry are resolved against the mirror,
+        # which fetches them from upstream the first time
+        if self.mirror is not None:
+            mirror_prefix = f'{self.mirror.endpoint}/'
+            for base_image in self.__get_base_images(dockerfile, build_args):
+                if base_image.startswith(mirror_prefix):
+                    if is_ecr_endpoint(DEPLOY_DOCKER_REPO_ENDPOINT) and \
+                            not self.aws_logged_in:
+                        self.aws_login_ecr()
+                    self.mirror.ensure_image(base_image[len(mirror_prefix):])
+
+        inputs_digest = self.__get_build_inputs_digest(
+            build_type=build_type,
+            context_path=docker_build_context_path,
+            dockerfile=dockerfile,
+            build_args=build_args,
+        )
+        image_digest = self.__get_docker_output(
+            'image inspect --format '
+            f'\'{{{{index .Config.Labels "{LABEL_INPUTS_DIGEST}"}}}}\' {tag}'
+        )
 
-        if not self.robot.is_local:
-            docker_build_command += f'DOCKER_HOST=ssh://{self.robot.name} '
+        if (not force) and (image_digest == inputs_digest):
+            last_duration = build_durations_cache.get(inputs_digest)
+            self.__log(
+                f'⏭️  Image \'{tag}\' already built from the same inputs '
+                f'({inputs_digest[:12]}), skipping build.'
+            )
+            if last_duration is not None:
+                self.__log(f'   ⏱️  Time saved: ~{last_duration:.0f}s')
+            self.__log()
+            return
 
-        docker_build_command += 'docker build '
+        docker_build_args = ''
 
         if self.robot.platform == 'x86_64':
-            docker_build_command += '--network=host '
+            docker_build_args += '--network=host '
 
-        docker_build_command += (
-            f'--build-arg REGISTRY_ENDPOINT={DEPLOY_DOCKER_REPO_ENDPOINT} '
-            f'--build-arg REPOS_LIST=\'{" ".join(self.component.src)}\' '
-            f'--build-arg PACKAGES_LIST=\'{" ".join(self.component.ros_pkgs)}\' '
+        if verbose:
+            docker_build_args += '--progress=plain '
+
+        for key in build_args:
+            docker_build_args += \
+                f'--build-arg {key}={shlex.quote(str(build_args[key]))} '
+
+        # The layer cache travels inside the images pushed to the cache
+        # references, so any building host can reuse it. The inline cache
+        # only has the layers of the built stage, so every named intermediate
+        # stage (e.g. the one compiling the ROS packages) is built and cached
+        # as its own image first.
+        docker_build_env = ''
+        docker_builds = []
+        cache_images = []
+        if cache:
+            stages_refs = {
+                stage: self.__get_build_cache_ref(build_type, stage)
+                for stage in self.__get_intermediate_stages(dockerfile)
+            }
+            cache_ref = self.__get_build_cache_ref(build_type)
+            docker_build_env = 'DOCKER_BUILDKIT=1 '
+            docker_build_args += '--build-arg BUILDKIT_INLINE_CACHE=1 '
+            for ref in [*stages_refs.values(), cache_ref]:
+                docker_build_args += f'--cache-from {ref} '
+            for stage, stage_ref in stages_refs.items():
+                docker_builds.append(
+                    f'{docker_build_args}--target {stage} --tag {stage_ref} '
+                )
+                cache_images.append((stage_ref, stage_ref))
+            cache_images.append((tag, cache_ref))
+            if any(is_ecr_endpoint(ref) for _, ref in cache_images) and \
+                    not self.aws_logged_in:
+                self.aws_login_ecr()
+
+        docker_builds.append(
+            f'{docker_build_args}'
+            f'--label {LABEL_INPUTS_DIGEST}={inputs_digest} '
             f'--tag {tag} '
         )
 
-        if verbose:
-            docker_build_command += '--progress=plain '
-
-        for key in metadata:
-            docker_build_command += f'--build-arg {key}=\'{metadata[key]}\' '
-
-        if build_type == BuildImageType.PROD:
-            docker_build_command += f'--build-arg FROM={self.component.image_name_dev} '
-
-        docker_build_command += f'-f {dockerfile} '
-        docker_build_command += f'{docker_build_context_path}'
-
-        print('Build command:')
-        print(docker_build_command)
-        print()
-
-        subprocess.run(
-            docker_build_command,
-            shell=True,
-            check=True,
+        if remote_context and not self.robot.is_local:
+            if is_ecr_endpoint(registry_endpoint) or \
+                    any(is_ecr_endpoint(ref) for _, ref in cache_images):
+                self.aws_login_ecr_build_host()
+            docker_build_commands = self.__get_remote_build_command(
+                build_type=build_type,
+                context_path=docker_build_context_path,
+                dockerfile=dockerfile,
+                docker_builds=docker_builds,
+                docker_build_env=docker_build_env,
+            )
+        else:
+            docker_build_commands = []
+            for docker_build_args in docker_builds:
+                docker_build_command = f'cd {DEV_ENV_PATH} && '
+                if not self.robot.is_local:
+                    docker_build_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} '
+                docker_build_command += f'{docker_build_env}docker build {docker_build_args}'
+                docker_build_command += f'-f {dockerfile} '
+                docker_build_command += f'{docker_build_context_path}'
+                docker_build_commands.append(docker_build_command)
+
+        start_time = time.monotonic()
+        build_outputs = []
+        for docker_build_command in docker_build_commands:
+            self.__log('Build command:')
+            self.__log(docker_build_command)
+            self.__log()
+            build_outputs.append(self.__run_streamed(docker_build_command))
+            self.__log()
+        build_durations_cache.set(inputs_digest, time.monotonic() - start_time)
+
+        context_transfer = re.search(
+            r'transferring context: (\S+) ([\d.]+)s done', build_outputs[0]
         )
-        print()
-
-    def push_image(self, build_type: BuildImageType):
-        # self.aws_is_logged_in()
-        # self.aws_login_ecr()
+        if context_transfer is not None:
+            self.__log(
+                f'📤 Build context: {get_tree_size(docker_build_context_path)} '
+                f'in disk, {context_transfer.group(1)} uploaded in '
+                f'{context_transfer.group(2)}s'
+            )
+            self.__log()
+
+        if cache:
+            self.__report_build_cache(build_type, build_outputs)
+        if cache and export_cache:
+            self.__export_build_cache(cache_images)
+        elif cache:
+            # The stages images are only needed to export their cache
+            for stage_ref in stages_refs.values():
+                self.__get_docker_output(f'rmi {stage_ref}')
+
+    def push_image(self,
+                   build_type: BuildImageType,
+                   registry_digests: set = None,
+                   ) -> int:
+        if is_ecr_endpoint(DEPLOY_DOCKER_REPO_ENDPOINT) and \
+                not self.aws_logged_in:
+            self.aws_login_ecr()
 
         if build_type == BuildImageType.DEVEL:
             tag = self.component.image_name_dev
         elif build_type == BuildImageType.PROD:
             tag = self.component.image_name_prod
 
+        # 'registry_digests' are the digests of the image already in the
+        # registry with the same tag, if they are known
+        if registry_digests:
+            local_image = self.__get_docker_output(
+                f'image inspect --format \'{{{{.Id}}}} {{{{.Size}}}}\' {tag}'
+            )
+            if local_image is not None:
+                local_id, local_size = local_image.split()
+                if local_id in registry_digests:
+                    self.__log(
+                        f'⏭️  Image \'{tag}\' already in the registry, '
+                        f'skipping push ({get_human_size(int(local_size))}).'
+                    )
+                    self.__log()
+                    return int(local_size)
+
+        if self.mirror is not None:
+            # The push to the mirror is a local copy, the upstream registry
+            # gets the image in background
+            self.__push_to_endpoint(tag, self.mirror.endpoint)
+            self.mirror.replicate(
+                tag,
+                lambda: self.__push_to_endpoint(
+                    tag, DEPLOY_DOCKER_REPO_ENDPOINT, prefix='[upstream] '
+                ),
+            )
+        else:
+            self.__push_to_endpoint(tag, DEPLOY_DOCKER_REPO_ENDPOINT)
+
+        self.__log()
+        return 0
+
+    def __push_to_endpoint(self, tag: str, endpoint: str, prefix: str = ''):
+        if is_ecr_endpoint(endpoint) and not self.aws_logged_in:
+            self.aws_login_ecr()
+
         docker_build_command = f'cd {DEV_ENV_PATH} && '
 
         if self.robot.is_local:
             ssh_prefix = ''
         else:
-            ssh_prefix = f'DOCKER_HOST=ssh://{self.robot.name}'
+            ssh_prefix = f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()}'
 
         docker_build_command += (
-            f'{ssh_prefix} docker tag {tag} {DEPLOY_DOCKER_REPO_ENDPOINT}/{tag} && '
-            f'{ssh_prefix} docker push {DEPLOY_DOCKER_REPO_ENDPOINT}/{tag} && '
-            f'{ssh_prefix} docker rmi {DEPLOY_DOCKER_REPO_ENDPOINT}/{tag}'
+            f'{ssh_prefix} docker tag {tag} {endpoint}/{tag} && '
+            f'{ssh_prefix} docker push {endpoint}/{tag} && '
+            f'{ssh_prefix} docker rmi {endpoint}/{tag}'
         )
 
-        subprocess.run(
-            docker_build_command,
-            shell=True,
-            check=True,
+        self.__run_streamed_logged_in(docker_build_command, endpoint, prefix)
+
+    def get_present_layers(self) -> set:
+        # Chain IDs of every layer in the host, a layer is reused only if
+        # all the layers below it are the same
+        image_ids = self.__get_docker_output('image ls --quiet --no-trunc')
+        if not image_ids:
+            return set()
+        layers_output = self.__get_docker_output(
+            'image inspect --format \'{{json .RootFS.Layers}}\' '
+            f'{" ".join(set(image_ids.split()))}'
         )
-
-        print()
-
-    def pull_image(self, image: str):
-
-        self.aws_login_ecr()
+        chain_ids = set()
+        for line in (layers_output or '').splitlines():
+            chain_ids.update(get_chain_ids(json.loads(line) or []))
+        return chain_ids
+
+    def get_missing_layers(self,
+                           registry: RegistryClient,
+                           image: str,
+                           present_layers: set,
+                           ) -> tuple:
+        # Returns all the layers of the image in the registry and the ones
+        # that are not in the host, as (digest, diff ID, size) tuples
+        _, manifest = registry.get_manifest(image)
+        if (manifest is None) or ('config' not in manifest):
+            return None, None
+        config = registry.get_config(image, manifest)
+        diff_ids = config['rootfs']['diff_ids']
+        layers = [
+            (layer['digest'], diff_id, layer['size'])
+            for layer, diff_id in zip(manifest['layers'], diff_ids)
+        ]
+        missing_layers = [
+            layer for layer, chain_id in zip(layers, get_chain_ids(diff_ids))
+            if chain_id not in present_layers
+        ]
+        return layers, missing_layers
+
+    def pull_image(self,
+                   image: str,
+                   prefix: str = '',
+                   endpoint: str = DEPLOY_DOCKER_REPO_ENDPOINT,
+                   ) -> bool:
+
+        if is_ecr_endpoint(endpoint) and not self.aws_logged_in:
+            self.aws_login_ecr()
 
         if self.robot.is_local:
             ssh_prefix = ''
         else:
-            ssh_prefix = f'DOCKER_HOST=ssh://{self.robot.name}'
+            ssh_prefix = f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()}'
 
         docker_build_command = (
-            f'{ssh_prefix} docker pull {DEPLOY_DOCKER_REPO_ENDPOINT}/{image} && '
-            f'{ssh_prefix} docker tag {DEPLOY_DOCKER_REPO_ENDPOINT}/{image} {image} && '
-            f'{ssh_prefix} docker rmi {DEPLOY_DOCKER_REPO_ENDPOINT}/{image}'
+            f'{ssh_prefix} docker pull {endpoint}/{image} && '
+            f'{ssh_prefix} docker tag {endpoint}/{image} {image} && '
+            f'{ssh_prefix} docker rmi {endpoint}/{image}'
         )
         try:
-            subprocess.run(
-                docker_build_command,
-                shell=True,
-                check=True,
+            self.__run_streamed_logged_in(
+                docker_build_command, endpoint, prefix,
             )
         except subprocess.CalledProcessError as e:
-            print(e)
-        print()
+            self.__log(e, prefix)
+            return False
+        return True
 
-    def pull_images(self, version: str):
+    def get_images_to_pull(self, version: str) -> list:
         if version.endswith('.dev'):
-            images_to_pull = [
+            return [
                 f'{self.component.image_name_base}.{version}',
             ]
         else:
-            images_to_pull = [
+            return [
                 f'{self.component.image_name_base}.{version}',
                 f'{self.component.image_name_base}.{version.replace(".beta","")}.dev',
             ]
 
-        for image in images_to_pull:
-            self.pull_image(image)
+    def get_pull_estimate(self,
+                          version: str,
+                          endpoint: str = DEPLOY_DOCKER_REPO_ENDPOINT,
+                          ) -> dict:
+        # Bytes to transfer for each image, None if they are unknown. The
+        # pull works even if the estimation fails. Layers shared by several
+        # images are transferred once, so they only count for the first one
+        # and the bytes of all the images can be added up.
+        images_to_pull = self.get_images_to_pull(version)
+        missing_bytes = {image: None for image in images_to_pull}
+        try:
+            registry = RegistryClient(endpoint)
+            present_layers = self.get_present_layers()
+            counted_layers = set()
+            self.__log(f'🔎 Layers already in \'{self.robot.name}\':')
+            for image in images_to_pull:
+                layers, missing_layers = self.get_missing_layers(
+                    registry, image, present_layers
+                )
+                if layers is None:
+                    self.__log(f'  - {image}: unknown')
+                    continue
+                new_layers = {
+                    digest: size for digest, _, size in missing_layers
+                    if digest not in counted_layers
+                }
+                counted_layers.update(new_layers)
+                missing_bytes[image] = sum(new_layers.values())
+                shared = len(missing_layers) - len(new_layers)
+                self.__log(
+                    f'  - {image}: {len(layers) - len(missing_layers)}/'
+                    f'{len(layers)} layers present, '
+                    f'{get_human_size(missing_bytes[image])} to transfer'
+                    + (f' ({shared} missing layers counted above)'
+                       if shared else '')
+                )
+            if None not in missing_bytes.values():
+                self.__log(
+                    f'  Total: {get_human_size(sum(missing_bytes.values()))} '
+                    'to transfer'
+                )
+            self.__log()
+        except RobotDevRegistryError as e:
+            self.__log(f'⚠️  Could not estimate the transfer: {e}')
+            self.__log()
+        return missing_bytes
+
+    def pull_images(self,
+                    version: str,
+                    max_workers: int = PULL_MAX_WORKERS,
+                    endpoint: str = DEPLOY_DOCKER_REPO_ENDPOINT,
+                    missing_bytes: dict = None,
+                    ) -> dict:
+        # Returns the success, duration and bytes of each image. The bytes
+        # are estimated against 'endpoint' unless 'missing_bytes' is given.
+        images_to_pull = self.get_images_to_pull(version)
+
+        if is_ecr_endpoint(endpoint) and not self.aws_logged_in:
+            self.aws_login_ecr()
+
+        if missing_bytes is None:
+            missing_bytes = self.get_pull_estimate(version, endpoint)
+
+        width = max(len(image) for image in images_to_pull)
+
+        def pull_task(image):
+            start_time = time.monotonic()
+            success = self.pull_image(
+                image, prefix=f'[{image.ljust(width)}] ', endpoint=endpoint,
+            )
+            return success, time.monotonic() - start_time
 
-    def get_running_container_info(self):
-        docker_command = ''
-        if not self.robot.is_local:
-            docker_command += f'DOCKER_HOST=ssh://{self.robot.name} \\\n'
-        docker_command += "docker inspect "
-        docker_command += self.component.container_name
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(pull_task, images_to_pull))
 
-        try:
-            process = subprocess.run(
-                docker_command,
-                shell=True,
-                check=True,
-                capture_output=True,
-                text=True,
+        self.__log()
+        self.__log('📋 Pull summary:')
+        for image, (success, duration) in zip(images_to_pull, results):
+            status = '✅' if success else '❌'
+            if missing_bytes.get(image) is not None:
+                size = get_human_size(missing_bytes[image])
+            else:
+                size = 'unknown size'
+            self.__log(f'  {status} {image.ljust(width)} {duration:7.1f}s  {size}')
+        if None not in missing_bytes.values():
+            self.__log(
+                f'  Total: {get_human_size(sum(missing_bytes.values()))}'
             )
-            return json.loads(process.stdout)[0]
-        except subprocess.CalledProcessError:
-            return None
+        self.__log()
+
+        return {
+            image: (success, duration, missing_bytes.get(image))
+            for image, (success, duration) in zip(images_to_pull, results)
+        }
+
+    def start_peer_registry(self, images: list) -> bool:
+        # Serves 'images' to other hosts from a temporary registry. Pushing
+        # to it is a local copy in the host.
+        endpoint = f'localhost:{PEER_REGISTRY_PORT}'
+        self.__get_docker_output(f'rm --force {PEER_REGISTRY_CONTAINER_NAME}')
+        if self.__get_docker_output(
+                f'run --detach --rm --name {PEER_REGISTRY_CONTAINER_NAME} '
+                f'--publish {PEER_REGISTRY_PORT}:5000 {PEER_REGISTRY_IMAGE}'
+                ) is None:
+            self.__log(f'❌ Could not start the peer registry in '
+                       f'\'{self.robot.name}\'.')
+            return False
 
-    def get_running_containers_and_images(self):
-        docker_command = ''
-        if not self.robot.is_local:
-            docker_command += f'DOCKER_HOST=ssh://{self.robot.name} \\\n'
-        docker_command += 'docker ps -a --format \'{{.Names}}: {{.Image}}\''
-        try:
-            process = subprocess.run(
-                docker_command,
-                shell=True,
-                check=True,
-                capture_output=True,
-                text=True,
+        for _ in range(PEER_REGISTRY_START_TIMEOUT):
+            if self.__get_docker_output(
+                    f'exec {PEER_REGISTRY_CONTAINER_NAME} '
+                    'wget --quiet --spider http://localhost:5000/v2/'
+                    ) is not None:
+                break
+            time.sleep(1)
+        else:
+            self.__log(f'❌ Peer registry in \'{self.robot.name}\' is not '
+                       'responding.')
+            self.stop_peer_registry()
+            return False
+
+        for image in images:
+            if self.__get_docker_output(
+                    f'tag {image} {endpoint}/{image}') is None or \
+                    self.__get_docker_output(
+                        f'push {endpoint}/{image}') is None:
+                self.__log(f'❌ Could not push \'{image}\' to the peer '
+                           f'registry in \'{self.robot.name}\'.')
+                self.stop_peer_registry()
+                return False
+            self.__get_docker_output(f'rmi {endpoint}/{image}')
+
+        self.__log(f'📡 Serving images from \'{self.robot.name}\'.')
+        return True
+
+    def stop_peer_registry(self):
+        self.__get_docker_output(f'rm --force {PEER_REGISTRY_CONTAINER_NAME}')
+
+    def __get_transfers_path(self, robot: Robot) -> pathlib.Path:
+        # Folder where the image archives are staged in each host
+        if robot.is_local:
+            return LOCAL_CACHE_PATH / FOLDER_IMAGE_TRANSFERS
+        return robot.get_host_ws_path().parent / \
+            REMOTE_IMAGE_TRANSFERS_FOLDER_NAME
+
+    def __run_in_host(self,
+                      robot: Robot,
+                      command: str,
+                      input: str = None,
+                      ) -> subprocess.CompletedProcess:
+        if not robot.is_local:
+            command = (
+                f'{robot.ssh_handler.get_ssh_command()} '
+                f'{robot.name} {shlex.quote(command)}'
             )
-            containers_list = []
-            for line in process.stdout.split('\n'):
-                if line.strip():
-                    line_split = line.split(':')
-                    if len(line_split) == 3:
-                        containers_list.append((
-                            line_split[0].strip(),
-                            line_split[1].strip(),
-                            line_split[2].strip(),
-                        ))
-            return containers_list
-
-        except subprocess.CalledProcessError:
-            return []
+        return subprocess.run(
+            command,
+            shell=True,
+            input=input,
+            capture_output=True,
+            text=True,
+        )
 
-    def run_command(self,
-                    command: str,
-                    volumes: List[tuple] = [],
-                    env_files: List[str] = [],
-                    env_vars: Dict[str, str] = [],
-                    interactive=False,
-                    detached_mode=False,
-                    build_type=BuildImageType.DEVEL,
-                    ):
+    def __save_image_archive(self,
+                             source_robot: Robot,
+                             image: str,
+                             image_id: str,
+                             present_layers: set,
+                             ) -> tuple:
+        # Saves and filters 'image' in the source host, so only the missing
+        # layers leave it. The archive is named after the image and the
+        # present layers, an archive left by an interrupted transfer is
+        # reused. Returns the archive name and the filter stats.
+        layers_digest = hashlib.sha256(
+            '\n'.join(sorted(present_layers)).encode()
+        ).hexdigest()[:12]
+        image_hex = image_id.split(':')[-1]
+        archive_name = f'{image_hex}.{layers_digest}.tar.gz'
+        saved_name = f'{image_hex}.tar'
+        script = shlex.quote(IMAGE_FILTER_SCRIPT.read_text())
+        source_command = (
+            f'mkdir -p {self.__get_transfers_path(source_robot)} && '
+            f'cd {self.__get_transfers_path(source_robot)} && '
+            f'if [ ! -f {archive_name} ]; then '
+            f'docker save --output {saved_name} {image} && '
+            f'python3 -c {script} {saved_name} '
+            f'{IMAGE_TRANSFER_COMPRESS_LEVEL} {archive_name}.partial '
+            f'2> {archive_name}.stats && '
+            f'mv {archive_name}.partial {archive_name}; '
+            f'status=$?; rm -f {saved_name} {archive_name}.partial; '
+            f'if [ $status -ne 0 ]; then '
+            f'cat {archive_name}.stats >&2; rm -f {archive_name}.stats; '
+            f'exit $status; fi; fi; '
+            f'cat {archive_name}.stats'
+        )
+        process = self.__run_in_host(
+            source_robot, source_command, input='\n'.join(present_layers),
+        )
+        if process.returncode != 0:
+            raise RobotDevDockerError(
+                f'Could not save image from the source host: '
+                f'{process.stderr.strip()}'
+            )
+        return archive_name, process.stdout.strip()
+
+    def __copy_image_archive(self,
+                             source_robot: Robot,
+                             archive_name: str,
+                             ) -> tuple:
+        # The archive goes through this host, with resumable copies in both
+        # links. Returns its path in the destination host and its size.
+        local_path = LOCAL_CACHE_PATH / FOLDER_IMAGE_TRANSFERS / archive_name
+        if not source_robot.is_local:
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            source_robot.ssh_handler.fetch_file_from_remote(
+                self.__get_transfers_path(source_robot) / archive_name,
+                local_path,
+            )
+        archive_size = local_path.stat().st_size
 
-        docker_command = ''
+        if self.robot.is_local:
+            return local_path, archive_size
+        destination_path = self.__get_transfers_path(self.robot) / archive_name
+        self.robot.ssh_handler.run_remote(
+            f'mkdir -p {destination_path.parent}'
+        )
+        self.robot.ssh_handler.send_file_to_remote(
+            local_path, destination_path
+        )
+        return destination_path, archive_size
+
+    def __remove_image_archives(self, source_robot: Robot, image_id: str):
+        # Archives of the image in every host, including the ones of
+        # transfers with other present layers
+        image_hex = image_id.split(':')[-1]
+        for robot in [source_robot, self.robot]:
+            if not robot.is_local:
+                self.__run_in_host(
+                    robot,
+                    f'rm -f {self.__get_transfers_path(robot)}/{image_hex}.*',
+                )
+        for path in (LOCAL_CACHE_PATH / FOLDER_IMAGE_TRANSFERS).glob(
+                f'{image_hex}.*'):
+            path.unlink(missing_ok=True)
+
+    def transfer_image(self,
+                       image: str,
+                       source_robot: Robot,
+                       prefix: str = '',
+                       ) -> tuple:
+        # Moves 'image' from 'source_robot' through the SSH links, without
+        # the registry. Returns if it succeeded and the transferred bytes.
+        source_handler = RobotDevDockerHandler(
+            self.component, source_robot, self.log_prefix
+        )
+        image_id = source_handler.__get_docker_output(
+            f'image inspect --format \'{{{{.Id}}}}\' {image}'
+        )
+        if image_id is None:
+            self.__log(f'❌ Image \'{image}\' not found in '
+                       f'\'{source_robot.name}\'.', prefix)
+            return False, 0
 
-        if self.component.display:
-            docker_command += 'DISPLAY=:0 xhost +local:* && '
+        host_image_id = self.__get_docker_output(
+            f'image inspect --format \'{{{{.Id}}}}\' {image}'
+        )
+        if host_image_id == image_id:
+            self.__log(f'⏭️  Image \'{image}\' already in '
+                       f'\'{self.robot.name}\'.', prefix)
+            return True, 0
+
+        # The reduced archive relies on the layer store of the classic
+        # docker engine, a full archive is sent if the host rejects it.
+        # Archives are kept until loaded, so interrupted transfers resume.
+        present_layers = self.get_present_layers()
+        for layers in [present_layers, set()]:
+            self.__log(f'📤 Sending \'{image}\' from '
+                       f'\'{source_robot.name}\' to \'{self.robot.name}\'...',
+                       prefix)
+            try:
+                archive_name, stats = self.__save_image_archive(
+                    source_robot, image, image_id, layers
+                )
+                archive_path, archive_size = self.__copy_image_archive(
+                    source_robot, archive_name
+                )
+            except (RobotDevDockerError, SSHError, RSyncError, OSError) as e:
+                self.__log(f'❌ {str(e).strip()}', prefix)
+                return False, 0
+
+            layers_count, _, missing_bytes = stats.rpartition('\n')[-1] \
+                .partition(' ')
+            if missing_bytes.isdigit():
+                self.__log(
+                    f'🗜️  {layers_count} layers sent '
+                    f'({get_human_size(int(missing_bytes))} uncompressed, '
+                    f'{get_human_size(archive_size)} compressed)',
+                    prefix,
+                )
+
+            process = self.__run_in_host(
+                self.robot,
+                f'docker load --input {archive_path} && '
+                f'docker tag {image_id} {image}',
+            )
+            for line in (process.stdout + process.stderr).strip().splitlines():
+                self.__log(line, prefix)
+            if process.returncode == 0:
+                self.__remove_image_archives(source_robot, image_id)
+                return True, archive_size
+            if not layers:
+                self.__log(f'❌ Could not load \'{image}\' in '
+                           f'\'{self.robot.name}\'.', prefix)
+                return False, archive_size
+            self.__log('⚠️  Load failed, sending all the layers.', prefix)
+
+    def transfer_images(self,
+                        version: str,
+                        source_robot: Robot,
+                        max_workers: int = PULL_MAX_WORKERS,
+                        ):
+        images_to_transfer = self.get_images_to_pull(version)
+        width = max(len(image) for image in images_to_transfer)
+
+        def transfer_task(image):
+            start_time = time.monotonic()
+            success, transferred_bytes = self.transfer_image(
+                image, source_robot, prefix=f'[{image.ljust(width)}] '
+            )
+            return success, time.monotonic() - start_time, transferred_bytes
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(transfer_task, images_to_transfer))
+
+        self.__log()
+        self.__log(f'📋 Transfer summary (\'{source_robot.name}\' -> '
+                   f'\'{self.robot.name}\'):')
+        for image, (success, duration, transferred_bytes) in \
+                zip(images_to_transfer, results):
+            status = '✅' if success else '❌'
+            self.__log(
+                f'  {status} {image.ljust(width)} {duration:7.1f}s  '
+                f'{get_human_size(transferred_bytes)}'
+            )
+        self.__log()
 
+    def get_containers_snapshot(self) -> dict:
+        # State of all the containers in the host with a single docker
+        # connection, by container name
+        docker_command = ''
         if not self.robot.is_local:
-            docker_command += f'DOCKER_HOST=ssh://{self.robot.name} \\\n'
-
+            docker_command += f'export DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} && '
         docker_command += (
-            'docker run \\\n'
+            'docker ps --all --quiet --no-trunc | '
+            'xargs --no-run-if-empty docker inspect'
+        )
+
+        # 'docker inspect' fails if a container is removed after being
+        # listed, but it still prints the rest of containers
+        process = subprocess.run(
+            docker_command,
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+        try:
+            inspect_infos = json.loads(process.stdout or '[]')
+        except json.JSONDecodeError:
+            return {}
+
+        snapshot = {}
+        for inspect_info in inspect_infos:
+            container_info = RobotDevContainerInfo(inspect_info)
+            snapshot[container_info.name] = container_info
+        return snapshot
+
+    def __get_container_options(self,
+                                volumes: List[tuple],
+                                env_files: List[str],
+                                env_vars: Dict[str, str],
+                                build_type: BuildImageType,
+                                ) -> str:
+        # Options of 'docker run' that define the container of the
+        # component, from '--tty' to the image
+
+        docker_command = (
             '  --tty \\\n'
             '  --privileged \\\n'
             '  --network=host \\\n'
             '  --pid=host \\\n'
         )
 
-        docker_command += f'  --name {self.component.container_name}\\\n'
-
-        # Interactive mode
-        if interactive:
-            docker_command += '  -it \\\n'
-            docker_command += '  --rm \\\n'
-        # Detached mode
-        elif detached_mode:
-            docker_command += '  -d \\\n'
-            docker_command += f'  -e=DETACHED_MODE=true \\\n'
-        # Not interactive not attached mode
-        else:
-            docker_command += '  --rm \\\n'
-
         # Nvidia
         if self.robot.platform == 'jetsonorin':
             docker_command += '  --runtime nvidia \\\n'
@@ -384,6 +1328,79 @@ class RobotDevDockerHandler:
         else:
             docker_command += f'  {self.component.image_name_prod} \\\n'
 
+        return docker_command
+
+    def __get_container_fingerprint(self,
+                                    container_options: str,
+                                    env_files: List[str],
+                                    build_type: BuildImageType,
+                                    ) -> str:
+        # Changes with the container options, the env files contents and
+        # the image contents, even if the image is rebuilt with the same tag
+        if build_type == BuildImageType.DEVEL:
+            image = self.component.image_name_dev
+        else:
+            image = self.component.image_name_prod
+        image_id = self.__get_docker_output(
+            f'image inspect --format \'{{{{.Id}}}}\' {image}'
+        )
+        fingerprint = hashlib.sha256(container_options.encode())
+        fingerprint.update(str(image_id).encode())
+        for env_file in env_files:
+            fingerprint.update(pathlib.Path(env_file).read_bytes())
+        return fingerprint.hexdigest()
+
+    def run_command(self,
+                    command: str,
+                    volumes: List[tuple] = [],
+                    env_files: List[str] = [],
+                    env_vars: Dict[str, str] = [],
+                    interactive=False,
+                    detached_mode=False,
+                    build_type=BuildImageType.DEVEL,
+                    containers: dict = None,
+                    ):
+
+        # Detached containers are created ahead of time when possible, so
+        # launching them is only 'docker start'
+        if detached_mode and not interactive:
+            self.start_container(
+                command=command,
+                volumes=volumes,
+                env_files=env_files,
+                env_vars=env_vars,
+                build_type=build_type,
+                containers=containers,
+            )
+            return True
+
+        docker_command = ''
+
+        if self.component.display:
+            docker_command += 'DISPLAY=:0 xhost +local:* && '
+
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} \\\n'
+
+        docker_command += 'docker run \\\n'
+
+        docker_command += f'  --name {self.component.container_name}\\\n'
+
+        # Interactive mode
+        if interactive:
+            docker_command += '  -it \\\n'
+            docker_command += '  --rm \\\n'
+        # Not interactive not attached mode
+        else:
+            docker_command += '  --rm \\\n'
+
+        docker_command += self.__get_container_options(
+            volumes=volumes,
+            env_files=env_files,
+            env_vars=env_vars,
+            build_type=build_type,
+        )
+
         # Command
         docker_command += f'  \\\n{command}\\\n \\\n'
 
@@ -396,24 +1413,284 @@ class RobotDevDockerHandler:
         except subprocess.CalledProcessError as e:
             if not interactive:
                 raise e
+            return False
+        return True
+
+    def prepare_container(self,
+                          command: str,
+                          volumes: List[tuple] = [],
+                          env_files: List[str] = [],
+                          env_vars: Dict[str, str] = [],
+                          build_type=BuildImageType.DEVEL,
+                          containers: dict = None,
+                          ) -> bool:
+        # Creates the detached container of the component without starting
+        # it. A prepared container with a different configuration is
+        # recreated, a running one is left as it is. Returns if the
+        # container was created.
+        container_name = self.component.container_name
+        if containers is None:
+            containers = self.get_containers_snapshot()
+
+        container_options = self.__get_container_options(
+            volumes=volumes,
+            env_files=env_files,
+            env_vars=env_vars,
+            build_type=build_type,
+        )
+        fingerprint = self.__get_container_fingerprint(
+            container_options + command, env_files, build_type
+        )
+
+        container_info = containers.get(container_name)
+        if container_info is not None:
+            if container_info.running:
+                print(f'ℹ️  Container \'{container_name}\' is running, '
+                      'skipping its preparation')
+                print()
+                return False
+            if container_info.labels.get(LABEL_CONTAINER_FINGERPRINT) == fingerprint:
+                return False
+            print(f'♻️  Prepared container \'{container_name}\' is outdated, '
+                  'recreating it')
+            self.remove_container()
+
+        docker_command = ''
+
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} \\\n'
+
+        docker_command += (
+            'docker create \\\n'
+            f'  --name {container_name} \\\n'
+            f'  --label {LABEL_CONTAINER_FINGERPRINT}={fingerprint} \\\n'
+            f'  -e=DETACHED_MODE=true \\\n'
+        )
+        docker_command += container_options
+        docker_command += f'  \\\n{command}\\\n \\\n'
+
+        subprocess.run(
+            docker_command,
+            shell=True,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        print(f'📦 Container \'{container_name}\' prepared')
+        print()
+        return True
+
+    def start_container(self,
+                        command: str,
+                        volumes: List[tuple] = [],
+                        env_files: List[str] = [],
+                        env_vars: Dict[str, str] = [],
+                        build_type=BuildImageType.DEVEL,
+                        containers: dict = None,
+                        ):
+        start_time = time.monotonic()
+        created = self.prepare_container(
+            command=command,
+            volumes=volumes,
+            env_files=env_files,
+            env_vars=env_vars,
+            build_type=build_type,
+            containers=containers,
+        )
+
+        docker_command = ''
+
+        if self.component.display:
+            docker_command += 'DISPLAY=:0 xhost +local:* && '
+
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} '
+
+        docker_command += f'docker start {self.component.container_name}'
+
+        subprocess.run(
+            docker_command,
+            shell=True,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+        # Launches that had to create the container are the baseline
+        launch_time = time.monotonic() - start_time
+        launch_kind = 'create' if created else 'start'
+        launch_times = launch_times_cache.get(self.component.container_name, {})
+        launch_times[launch_kind] = launch_time
+        launch_times_cache.set(self.component.container_name, launch_times)
+
+        self.__log(
+            f'🚀 Container \'{self.component.container_name}\' launched in '
+            f'{launch_time:.2f}s '
+            f'({"created and started" if created else "prepared, only started"})'
+        )
+        if (not created) and ('create' in launch_times):
+            self.__log(
+                f'   ⏱️  Without preparing it: {launch_times["create"]:.2f}s'
+            )
+        self.__log()
+
+    def remove_container(self):
+        self.__get_docker_output(f'rm --force {self.component.container_name}')
+
+    def ensure_warm_container(self,
+                              volumes: List[tuple] = [],
+                              env_files: List[str] = [],
+                              env_vars: Dict[str, str] = [],
+                              build_type=BuildImageType.DEVEL,
+                              containers: dict = None,
+                              shared_volumes: List[tuple] = [],
+                              shared_env_vars: Dict[str, str] = {},
+                              ):
+        # Long-lived container where commands are executed instead of
+        # creating a container for each one. It exits by itself after
+        # WARM_CONTAINER_IDLE_TIMEOUT without commands, and it is recreated
+        # if its configuration changes. 'shared_volumes' and
+        # 'shared_env_vars' are used by some of the commands (e.g. the
+        # compiler cache), they are not part of the configuration.
+        container_name = self.get_warm_container_name()
+        if containers is None:
+            containers = self.get_containers_snapshot()
+
+        fingerprint = self.__get_container_fingerprint(
+            self.__get_container_options(
+                volumes=volumes,
+                env_files=env_files,
+                env_vars=env_vars,
+                build_type=build_type,
+            ),
+            env_files,
+            build_type,
+        )
+        container_options = self.__get_container_options(
+            volumes=volumes + shared_volumes,
+            env_files=env_files,
+            env_vars={**env_vars, **shared_env_vars},
+            build_type=build_type,
+        )
+
+        container_info = containers.get(container_name)
+        if container_info is not None:
+            if container_info.running and \
+                    container_info.labels.get(LABEL_CONTAINER_FINGERPRINT) == fingerprint:
+                return
+            # Commands running in it from other terminals would be killed
+            if container_info.running:
+                live_execs = self.__get_docker_output(
+                    f'exec {container_name} sh -c ' + shlex.quote(
+                        f'for exec_file in {WARM_CONTAINER_EXECS_PATH}/*; do '
+                        '[ -e "$exec_file" ] && '
+                        'kill -0 "${exec_file##*/}" 2>/dev/null && '
+                        'echo "${exec_file##*/}"; '
+                        'done; true'
+                    )
+                )
+                if live_execs:
+                    raise RobotDevDockerError(
+                        f'Warm container \'{container_name}\' is outdated, '
+                        'but it is still running commands (PIDs: '
+                        f'{", ".join(live_execs.split())}). Wait for them to '
+                        'finish or stop them, then run again.'
+                    )
+            print(f'♻️  Warm container \'{container_name}\' is outdated, '
+                  'recreating it')
+            self.__get_docker_output(f'rm --force {container_name}')
+        else:
+            print(f'🔥 Starting warm container \'{container_name}\'')
+        print()
+
+        watchdog = (
+            f'mkdir -p {WARM_CONTAINER_EXECS_PATH} && '
+            f'touch {WARM_CONTAINER_LAST_USE_PATH} && '
+            'while true; do '
+            f'sleep {WARM_CONTAINER_WATCHDOG_PERIOD}; '
+            f'for exec_file in {WARM_CONTAINER_EXECS_PATH}/*; do '
+            '[ -e "$exec_file" ] && ! kill -0 "${exec_file##*/}" 2>/dev/null '
+            '&& rm -f "$exec_file"; '
+            'done; '
+            f'if [ -z "$(ls -A {WARM_CONTAINER_EXECS_PATH})" ] && '
+            f'[ $(( $(date +%s) - $(stat -c %Y {WARM_CONTAINER_LAST_USE_PATH}) )) '
+            f'-ge {WARM_CONTAINER_IDLE_TIMEOUT} ]; then exit 0; fi; '
+            'done'
+        )
+
+        docker_command = ''
+
+        if self.component.display:
+            docker_command += 'DISPLAY=:0 xhost +local:* && '
+
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} \\\n'
+
+        docker_command += (
+            'docker run \\\n'
+            f'  --name {container_name} \\\n'
+            '  --detach \\\n'
+            '  --rm \\\n'
+            f'  --label {LABEL_CONTAINER_FINGERPRINT}={fingerprint} \\\n'
+        )
+        docker_command += container_options
+        docker_command += f'  bash -c {shlex.quote(watchdog)}'
+
+        subprocess.run(
+            docker_command,
+            shell=True,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def get_warm_container_name(self) -> str:
+        return f'{self.component.container_name}{WARM_CONTAINER_SUFFIX}'
+
+    def exec_warm_command(self,
+                          command: str,
+                          interactive=False,
+                          build_type=BuildImageType.DEVEL,
+                          ):
+        # Running commands are registered by PID, so the container is not
+        # stopped while they run
+        if not command:
+            command = 'bash'
+        wrapped_command = (
+            f'mkdir -p {WARM_CONTAINER_EXECS_PATH}; '
+            f'touch {WARM_CONTAINER_LAST_USE_PATH} '
+            f'{WARM_CONTAINER_EXECS_PATH}/$$; '
+            f'{command}; '
+            'status=$?; '
+            f'rm -f {WARM_CONTAINER_EXECS_PATH}/$$; '
+            f'touch {WARM_CONTAINER_LAST_USE_PATH}; '
+            'exit $status'
+        )
+        return self.exec_command(
+            command=f'bash -c {shlex.quote(wrapped_command)}',
+            interactive=interactive,
+            build_type=build_type,
+            container_name=self.get_warm_container_name(),
+        )
 
     def exec_command(self,
                      command: str,
                      interactive=False,
                      build_type=BuildImageType.DEVEL,
+                     container_name: str = None,
                      ):
 
         docker_command = ''
 
         if not self.robot.is_local:
-            docker_command += f'DOCKER_HOST=ssh://{self.robot.name} \\\n'
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} \\\n'
 
         docker_command += 'docker exec '
 
         if interactive:
             docker_command += '-it '
 
-        docker_command += f'{self.component.container_name} {command}'
+        if container_name is None:
+            container_name = self.component.container_name
+
+        docker_command += f'{container_name} {command}'
 
         try:
             subprocess.run(
@@ -424,3 +1701,5 @@ class RobotDevDockerHandler:
         except subprocess.CalledProcessError as e:
             if not interactive:
                 raise e
+            return False
+        return True
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import yaml
+import fnmatch
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from robotdevenv.constants import FILE_ROBOTS_PATH
+from robotdevenv.constants import FLEET_DEFAULT_MAX_WORKERS
+
+
+FLEET_PLATFORM_PREFIX = 'platform:'
+FLEET_ALL_ROBOTS = 'all'
+
+
+class RobotDevFleetError(Exception): pass
+
+
+def is_fleet_selection(selection:str) -> bool:
+    return (',' in selection) or \
+        any(char in selection for char in '*?[') or \
+        selection.startswith(FLEET_PLATFORM_PREFIX) or \
+        (selection == FLEET_ALL_ROBOTS)
+
+
+def select_robots(selection:str) -> list:
+    try:
+        with open(FILE_ROBOTS_PATH, 'r') as file:
+            robots_host_info:dict = yaml.safe_load(file)
+    except FileNotFoundError:
+        raise RobotDevFleetError(f'File \'{FILE_ROBOTS_PATH}\' not found.')
+
+    selected = []
+    for item in selection.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item == FLEET_ALL_ROBOTS:
+            matches = list(robots_host_info)
+        elif item.startswith(FLEET_PLATFORM_PREFIX):
+            platform = item[len(FLEET_PLATFORM_PREFIX):]
+            matches = [
+                name for name, info in robots_host_info.items()
+                if info.get('platform') == platform
+            ]
+        else:
+            matches = fnmatch.filter(robots_host_info, item)
+            if (not matches) and (item == 'localhost'):
+                matches = [item]
+        if not matches:
+            raise RobotDevFleetError(
+                f'No robots in \'{FILE_ROBOTS_PATH}\' match \'{item}\'.'
+            )
+        selected += [name for name in matches if name not in selected]
+
+    return sorted(selected)
+
+
+class RobotDevFleetHandler:
+
+    def __init__(self,
+                argv:list=None,
+            ):
+        if argv is None:
+            argv = sys.argv
+
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument('-r', '--robot', type=str)
+        parser.add_argument(
+            '--fleet-jobs', type=int, default=FLEET_DEFAULT_MAX_WORKERS
+        )
+        args, entry_point_args = parser.parse_known_args(argv[1:])
+
+        is_fleet = (args.robot is not None) and \
+            is_fleet_selection(args.robot)
+
+        # Public attributes
+        self.is_fleet = is_fleet
+        self.robot_names = select_robots(args.robot) if is_fleet else []
+        self.max_workers = args.fleet_jobs
+        self.entry_point = argv[0]
+        self.entry_point_args = entry_point_args
+
+        # Private attributes
+        self.__print_lock = threading.Lock()
+
+
+    def __print(self, prefix:str, line:str):
+        with self.__print_lock:
+            print(f'{prefix} {line}', flush=True)
+
+
+    def __run_robot(self, robot_name:str, prefix:str):
+        start_time = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, self.entry_point, *self.entry_point_args,
+                '--robot', robot_name],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            # Entry points write to a pipe, output is streamed line by line
+            # only if it is not buffered
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'},
+        )
+        for line in process.stdout:
+            self.__print(prefix, line.rstrip('\n'))
+        process.wait()
+        return process.returncode, time.monotonic() - start_time
+
+
+    def run_entry_point(self):
+        width = max(len(name) for name in self.robot_names)
+        prefixes = {
+            name: f'[{name.ljust(width)}]' for name in self.robot_names
+        }
+
+        print()
+        print('🤖🤖 UR ROBOT DEVELOPMENT ENVIRONMENT 🤖🤖')
+        print(f'  🦾 Fleet execution: {len(self.robot_names)} robots 🦿')
+        print()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                name: executor.submit(self.__run_robot, name, prefixes[name])
+                for name in self.robot_names
+            }
+
+        print()
+        print('📋 Fleet summary:')
+        print()
+        failed = []
+        for name, future in futures.items():
+            returncode, duration = future.result()
+            status = '✅ OK    ' if returncode == 0 else '❌ FAILED'
+            print(f'  {prefixes[name]} {status} {duration:7.1f}s')
+            if returncode != 0:
+                failed.append(name)
+        print()
+
+        if failed:
+            raise RobotDevFleetError(
+                f'Execution failed in robots: {", ".join(failed)}'
+            )
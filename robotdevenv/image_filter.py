@@ -0,0 +1,85 @@
+# Writes to argv[3] the 'docker save' archive in argv[1], gzip compressed
+# with level argv[2] and without the layers whose chain ID is read from stdin.
+# 'docker load' only reads the layers it does not have, so the reduced
+# archive loads as the full image. The same inputs give the same file, so
+# interrupted copies of it can be resumed. It runs in the host that has the
+# image, so it only uses the standard library.
+import sys
+import gzip
+import json
+import hashlib
+import tarfile
+import posixpath
+
+
+def get_chain_ids(diff_ids:list) -> list:
+    chain_ids = []
+    for diff_id in diff_ids:
+        if chain_ids:
+            chain_ids.append('sha256:' + hashlib.sha256(
+                f'{chain_ids[-1]} {diff_id}'.encode()
+            ).hexdigest())
+        else:
+            chain_ids.append(diff_id)
+    return chain_ids
+
+
+def main():
+    saved_path = sys.argv[1]
+    compress_level = int(sys.argv[2])
+    output_path = sys.argv[3]
+    present_layers = set(sys.stdin.read().split())
+
+    with tarfile.open(saved_path) as saved_tar:
+        manifest = json.load(saved_tar.extractfile('manifest.json'))[0]
+        config = json.load(saved_tar.extractfile(manifest['Config']))
+        chain_ids = get_chain_ids(config['rootfs']['diff_ids'])
+        members = saved_tar.getmembers()
+        members_by_name = {member.name: member for member in members}
+
+        # Equal layers may be stored once and linked from other paths
+        needed_files = set()
+        skipped_files = set()
+        for layer_file, chain_id in zip(manifest['Layers'], chain_ids):
+            if chain_id in present_layers:
+                skipped_files.add(layer_file)
+                continue
+            needed_files.add(layer_file)
+            member = members_by_name.get(layer_file)
+            if (member is not None) and member.issym():
+                needed_files.add(posixpath.normpath(posixpath.join(
+                    posixpath.dirname(layer_file), member.linkname
+                )))
+        skipped_files -= needed_files
+
+        missing_bytes = sum(
+            members_by_name[layer_file].size for layer_file in needed_files
+            if (layer_file in members_by_name) and
+                members_by_name[layer_file].isfile()
+        )
+        print(
+            f'{len(manifest["Layers"]) - len(skipped_files)}/'
+            f'{len(manifest["Layers"])} {missing_bytes}',
+            file=sys.stderr,
+        )
+
+        with open(output_path, 'wb') as output, \
+                gzip.GzipFile(
+                    filename='',
+                    fileobj=output,
+                    mode='wb',
+                    compresslevel=compress_level,
+                    mtime=0,
+                ) as compressed, \
+                tarfile.open(fileobj=compressed, mode='w|') as archive:
+            for member in members:
+                if member.name in skipped_files:
+                    continue
+                if member.isfile():
+                    archive.addfile(member, saved_tar.extractfile(member))
+                else:
+                    archive.addfile(member)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import pathlib
+
+
+class RobotDevInotifyError(Exception): pass
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_BUFFER_SIZE = 64 * 1024
+
+
+class RobotDevInotifyWatcher:
+
+    def __init__(self,
+                root_paths:list,
+            ):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            raise RobotDevInotifyError(
+                f'inotify_init1 failed: {os.strerror(ctypes.get_errno())}'
+            )
+
+        self.__libc = libc
+        self.__fd = fd
+        self.__watches = {}
+
+        for root_path in root_paths:
+            self.__add_watch_tree(pathlib.Path(root_path), is_root=True)
+
+
+    def __add_watch(self, path:pathlib.Path, is_root:bool) -> bool:
+        # Returns False if a subfolder disappeared before being watched (e.g.
+        # temp folders), its removal is already in the events
+        wd = self.__libc.inotify_add_watch(
+            self.__fd, os.fsencode(path), WATCH_MASK | IN_ONLYDIR
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            if (not is_root) and (error in [errno.ENOENT, errno.ENOTDIR]):
+                return False
+            raise RobotDevInotifyError(
+                f'Can not watch \'{path}\': {os.strerror(error)}. If the '
+                'limit of watches was reached, increase '
+                '\'fs.inotify.max_user_watches\'.'
+            )
+        self.__watches[wd] = path
+        return True
+
+
+    def __add_watch_tree(self,
+                root_path:pathlib.Path,
+                is_root:bool=False,
+            ) -> set:
+        # Returns the files found, useful when a whole folder appears
+        found_paths = set()
+        for dir_path, dir_names, file_names in os.walk(root_path):
+            dir_path = pathlib.Path(dir_path)
+            if not self.__add_watch(dir_path, is_root and dir_path == root_path):
+                dir_names.clear()
+                continue
+            found_paths.add(dir_path)
+            found_paths.update(dir_path / name for name in file_names)
+        return found_paths
+
+
+    def __read_events(self, changes:set) -> bool:
+        # Returns False if the kernel queue overflowed and events were lost
+        buffer = os.read(self.__fd, READ_BUFFER_SIZE)
+        complete = True
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_length = \
+                EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                complete = False
+                continue
+
+            if mask & IN_IGNORED:
+                self.__watches.pop(wd, None)
+                continue
+
+            dir_path = self.__watches.get(wd)
+            if dir_path is None:
+                continue
+
+            path = dir_path / os.fsdecode(name) if name else dir_path
+            changes.add(path)
+
+            if (mask & IN_ISDIR) and (mask & (IN_CREATE | IN_MOVED_TO)) \
+                    and path.is_dir():
+                changes.update(self.__add_watch_tree(path))
+
+        return complete
+
+
+    def wait_changes(self, debounce:float) -> tuple:
+        # Blocks until there are changes and no new events arrive for
+        # 'debounce' seconds. Returns the changed paths and whether the list
+        # is complete.
+        changes = set()
+        complete = True
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self.__fd], [], [], timeout)
+            if not ready:
+                return changes, complete
+            complete &= self.__read_events(changes)
+            timeout = debounce
+
+
+    def close(self):
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
@@ -0,0 +1,197 @@
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from robotdevenv.robot import RobotDevRobot as Robot
+from robotdevenv.singleton import Singleton
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+from robotdevenv.registry import split_image_reference
+from robotdevenv.registry import MANIFEST_MEDIA_TYPES
+
+from robotdevenv.constants import DEPLOY_DOCKER_REPO_ENDPOINT
+from robotdevenv.constants import REGISTRY_MIRROR_IMAGE
+from robotdevenv.constants import REGISTRY_MIRROR_PORT
+from robotdevenv.constants import REGISTRY_MIRROR_CONTAINER_NAME
+from robotdevenv.constants import REGISTRY_MIRROR_VOLUME_NAME
+from robotdevenv.constants import REGISTRY_MIRROR_START_TIMEOUT
+from robotdevenv.constants import REGISTRY_MIRROR_REPLICATION_MAX_JOBS
+
+
+mirror_stats_cache = LocalCache('registry_mirror_stats')
+
+
+class RobotDevRegistryMirrorError(Exception): pass
+
+
+class RobotDevRegistryMirror(Singleton):
+
+    def __init__(self,
+                robot:Robot,
+            ):
+        # Public attributes
+        self.robot = robot
+        # Endpoint for the docker daemon of the mirror host (plain http is
+        # allowed for localhost) and for the other robots in the LAN
+        self.endpoint = f'localhost:{REGISTRY_MIRROR_PORT}'
+        self.lan_endpoint = f'{robot.address}:{REGISTRY_MIRROR_PORT}'
+
+        # Private attributes
+        self.__lock = threading.Lock()
+        self.__running = False
+        self.__hits = 0
+        self.__misses = 0
+        self.__replication_executor = None
+        self.__replications = {}
+
+
+    @classmethod
+    def get_singleton_key(cls, robot:Robot, **_):
+        return robot.name
+
+
+    def __run_docker(self, docker_args:str) -> subprocess.CompletedProcess:
+        docker_command = ''
+        if not self.robot.is_local:
+            docker_command += f'DOCKER_HOST={self.robot.ssh_handler.get_docker_host()} '
+        docker_command += f'docker {docker_args}'
+        return subprocess.run(
+            docker_command,
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+
+
+    def __is_healthy(self) -> bool:
+        return self.__run_docker(
+            f'exec {REGISTRY_MIRROR_CONTAINER_NAME} '
+            'wget --quiet --spider http://localhost:5000/v2/'
+        ).returncode == 0
+
+
+    def ensure_running(self):
+        with self.__lock:
+            if self.__running:
+                return
+
+            if not self.__is_healthy():
+                print(f'🪞 Starting registry mirror in \'{self.robot.name}\'...')
+                self.__run_docker(
+                    f'rm --force {REGISTRY_MIRROR_CONTAINER_NAME}'
+                )
+                # The volume keeps the mirrored images between restarts
+                process = self.__run_docker(
+                    f'run --detach --restart unless-stopped '
+                    f'--name {REGISTRY_MIRROR_CONTAINER_NAME} '
+                    f'--publish {REGISTRY_MIRROR_PORT}:5000 '
+                    f'--volume {REGISTRY_MIRROR_VOLUME_NAME}:/var/lib/registry '
+                    f'{REGISTRY_MIRROR_IMAGE}'
+                )
+                if process.returncode != 0:
+                    raise RobotDevRegistryMirrorError(
+                        f'Could not start the registry mirror in '
+                        f'\'{self.robot.name}\': {process.stderr.strip()}'
+                    )
+                for _ in range(REGISTRY_MIRROR_START_TIMEOUT):
+                    if self.__is_healthy():
+                        break
+                    time.sleep(1)
+                else:
+                    raise RobotDevRegistryMirrorError(
+                        f'Registry mirror in \'{self.robot.name}\' is not '
+                        'responding.'
+                    )
+
+            self.__running = True
+
+
+    def __has_image(self, image:str) -> bool:
+        name, tag = split_image_reference(image)
+        return self.__run_docker(
+            f'exec {REGISTRY_MIRROR_CONTAINER_NAME} '
+            'wget --quiet --spider '
+            f'--header \'Accept: {MANIFEST_MEDIA_TYPES}\' '
+            f'http://localhost:5000/v2/{name}/manifests/{tag}'
+        ).returncode == 0
+
+
+    def __count(self, hit:bool):
+        with self.__lock:
+            if hit:
+                self.__hits += 1
+            else:
+                self.__misses += 1
+            stats = mirror_stats_cache.get(
+                self.robot.name, {'hits': 0, 'misses': 0}
+            )
+            stats['hits' if hit else 'misses'] += 1
+            mirror_stats_cache.set(self.robot.name, stats)
+
+
+    def ensure_image(self, image:str):
+        # Pull-through: images missing in the mirror are fetched from the
+        # upstream registry once, and served by the mirror from then on
+        self.ensure_running()
+
+        if self.__has_image(image):
+            self.__count(hit=True)
+            return
+
+        self.__count(hit=False)
+        print(f'🪞 Mirror miss, fetching \'{image}\' from '
+              f'\'{DEPLOY_DOCKER_REPO_ENDPOINT}\'...')
+        upstream_image = f'{DEPLOY_DOCKER_REPO_ENDPOINT}/{image}'
+        mirror_image = f'{self.endpoint}/{image}'
+        for docker_args in [
+                    f'pull {upstream_image}',
+                    f'tag {upstream_image} {mirror_image}',
+                    f'push {mirror_image}',
+                ]:
+            process = self.__run_docker(docker_args)
+            if process.returncode != 0:
+                raise RobotDevRegistryMirrorError(
+                    f'Could not mirror \'{image}\': {process.stderr.strip()}'
+                )
+        self.__run_docker(f'rmi {upstream_image} {mirror_image}')
+
+
+    def replicate(self, image:str, push_function):
+        # Upstream pushes run in background, 'wait_replication' collects them
+        with self.__lock:
+            if self.__replication_executor is None:
+                self.__replication_executor = ThreadPoolExecutor(
+                    max_workers=REGISTRY_MIRROR_REPLICATION_MAX_JOBS
+                )
+            self.__replications[image] = \
+                self.__replication_executor.submit(push_function)
+
+
+    def wait_replication(self) -> list:
+        # Returns the errors of the upstream pushes
+        with self.__lock:
+            replications = self.__replications
+            self.__replications = {}
+
+        if replications:
+            print(f'🪞 Waiting for {len(replications)} upstream '
+                  'replications...')
+            print()
+
+        errors = []
+        for image, future in replications.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f'{image} (replication): {e}')
+        return errors
+
+
+    def print_stats(self):
+        stats = mirror_stats_cache.get(
+            self.robot.name, {'hits': 0, 'misses': 0}
+        )
+        print(f'🪞 Registry mirror \'{self.robot.name}\':')
+        print(f'  - This run: {self.__hits} hits, {self.__misses} misses')
+        print(f'  - Total:    {stats["hits"]} hits, {stats["misses"]} misses')
+        print()
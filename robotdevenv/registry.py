@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import boto3
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
+
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+
+from robotdevenv.constants import DEPLOY_DOCKER_REPO_ENDPOINT
+from robotdevenv.constants import ECR_TOKEN_REFRESH_MARGIN
+from robotdevenv.constants import REGISTRY_MAX_WORKERS
+from robotdevenv.constants import REGISTRY_REQUEST_TIMEOUT
+
+
+MANIFEST_MEDIA_TYPES = ', '.join([
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+])
+# Docker client errors when the registry rejects the login credentials
+ECR_AUTH_ERROR_MARKERS = [
+    'no basic auth credentials',
+    'authorization token has expired',
+    'denied',
+]
+
+
+class RobotDevRegistryError(Exception): pass
+
+
+ecr_authorization_cache = LocalCache('credentials/ecr_authorization', private=True)
+
+
+def split_image_reference(image:str) -> tuple:
+    # The tag is after the last ':' only if it is not part of a registry
+    # host with port, e.g. 'localhost:5000/name'. Digests are ignored.
+    image = image.split('@')[0]
+    name, separator, tag = image.rpartition(':')
+    if (not separator) or ('/' in tag):
+        return image, 'latest'
+    return name, tag
+
+
+def get_chain_ids(diff_ids:list) -> list:
+    # Layer identifiers that also depend on all the layers below them
+    chain_ids = []
+    for diff_id in diff_ids:
+        if chain_ids:
+            chain_ids.append('sha256:' + hashlib.sha256(
+                f'{chain_ids[-1]} {diff_id}'.encode()
+            ).hexdigest())
+        else:
+            chain_ids.append(diff_id)
+    return chain_ids
+
+
+def is_ecr_endpoint(endpoint:str) -> bool:
+    return '.dkr.ecr.' in endpoint
+
+
+def _get_ecr_cache_key() -> str:
+    return f'ecr:{os.environ.get("AWS_PROFILE", "default")}'
+
+
+def get_cached_ecr_authorization() -> dict:
+    # Returns None if there is no token or it is about to expire
+    authorization = ecr_authorization_cache.get(_get_ecr_cache_key())
+    if authorization is None:
+        return None
+    if authorization['expires_at'] - time.time() < ECR_TOKEN_REFRESH_MARGIN:
+        return None
+    return authorization
+
+
+def get_ecr_authorization() -> dict:
+    authorization = get_cached_ecr_authorization()
+    if authorization is not None:
+        return authorization
+
+    erc_client = boto3.client(service_name='ecr')
+    response = erc_client.get_authorization_token()
+    authorization_data = response['authorizationData'][0]
+    username, password = base64.b64decode(
+        authorization_data['authorizationToken']
+    ).decode('utf-8').split(':')
+    authorization = {
+        'username': username,
+        'password': password,
+        'registry_url': authorization_data['proxyEndpoint'],
+        'expires_at': authorization_data['expiresAt'].timestamp(),
+        'docker_logged_in': False,
+    }
+    ecr_authorization_cache.set(_get_ecr_cache_key(), authorization)
+    return authorization
+
+
+def is_ecr_logged_in(authorization:dict, host:str=None) -> bool:
+    # Docker logins last as long as the token they used, 'host' is a remote
+    # docker client, the local one otherwise
+    if authorization['expires_at'] <= time.time():
+        return False
+    if host is None:
+        return authorization['docker_logged_in']
+    return host in authorization.get('logged_in_hosts', [])
+
+
+def is_ecr_auth_error(output:str) -> bool:
+    output = (output or '').lower()
+    return any(marker in output for marker in ECR_AUTH_ERROR_MARKERS)
+
+
+def invalidate_ecr_authorization():
+    # The token or the logins were rejected, e.g. the token was revoked or
+    # another login replaced the credentials of the docker client
+    ecr_authorization_cache.invalidate(_get_ecr_cache_key())
+
+
+def set_ecr_docker_logged_in():
+    authorization = ecr_authorization_cache.get(_get_ecr_cache_key())
+    if authorization is not None:
+        authorization['docker_logged_in'] = True
+        ecr_authorization_cache.set(_get_ecr_cache_key(), authorization)
+
+
+def set_ecr_host_logged_in(host:str):
+    # Hosts whose own docker client is logged in with the cached token
+    authorization = ecr_authorization_cache.get(_get_ecr_cache_key())
+    if authorization is not None:
+        logged_in_hosts = authorization.get('logged_in_hosts', [])
+        if host not in logged_in_hosts:
+            authorization['logged_in_hosts'] = logged_in_hosts + [host]
+            ecr_authorization_cache.set(_get_ecr_cache_key(), authorization)
+
+
+class RobotDevRegistryClient:
+
+    def __init__(self,
+                endpoint:str=DEPLOY_DOCKER_REPO_ENDPOINT,
+            ):
+        # Local stand-in registries (e.g. 'registry:2') are served over http
+        host = endpoint.split(':')[0]
+        if host in ['localhost', '127.0.0.1']:
+            base_url = f'http://{endpoint}/v2'
+        else:
+            base_url = f'https://{endpoint}/v2'
+
+        if is_ecr_endpoint(endpoint):
+            try:
+                authorization = get_ecr_authorization()
+            except (BotoCoreError, ClientError) as e:
+                raise RobotDevRegistryError(
+                    f'Could not get ECR authorization: {e}'
+                )
+            credentials = base64.b64encode(
+                f'{authorization["username"]}:{authorization["password"]}'
+                .encode()
+            ).decode()
+            headers = {'Authorization': f'Basic {credentials}'}
+        else:
+            headers = {}
+
+        self.endpoint = endpoint
+        self.__base_url = base_url
+        self.__headers = headers
+
+
+    def __request(self, path:str, accept:str=None):
+        headers = dict(self.__headers)
+        if accept is not None:
+            headers['Accept'] = accept
+        request = urllib.request.Request(
+            f'{self.__base_url}/{path}', headers=headers
+        )
+        try:
+            with urllib.request.urlopen(
+                        request, timeout=REGISTRY_REQUEST_TIMEOUT
+                    ) as response:
+                return response.headers, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None, None
+            raise RobotDevRegistryError(
+                f'Registry \'{self.endpoint}\' request \'{path}\' failed: '
+                f'{e.code} {e.reason}'
+            )
+        except urllib.error.URLError as e:
+            raise RobotDevRegistryError(
+                f'Registry \'{self.endpoint}\' not reachable: {e.reason}'
+            )
+
+
+    def get_manifest(self, image:str) -> tuple:
+        # Returns the manifest digest and the manifest, or (None, None) if
+        # the image is not in the registry
+        name, tag = split_image_reference(image)
+        headers, manifest = self.__request(
+            f'{name}/manifests/{tag}', accept=MANIFEST_MEDIA_TYPES
+        )
+        if manifest is None:
+            return None, None
+        return headers.get('Docker-Content-Digest'), manifest
+
+
+    def get_config(self, image:str, manifest:dict) -> dict:
+        name, _ = split_image_reference(image)
+        _, config = self.__request(
+            f'{name}/blobs/{manifest["config"]["digest"]}'
+        )
+        return config
+
+
+    def get_image_digests(self, image:str) -> set:
+        # Digests that may identify the image locally: the manifest digest
+        # (containerd image store) and the config digest (image ID)
+        manifest_digest, manifest = self.get_manifest(image)
+        if manifest is None:
+            return set()
+        digests = {manifest_digest}
+        if 'config' in manifest:
+            digests.add(manifest['config']['digest'])
+        return digests
+
+
+    def get_images_digests(self, images:list) -> dict:
+        with ThreadPoolExecutor(max_workers=REGISTRY_MAX_WORKERS) as executor:
+            results = executor.map(self.get_image_digests, images)
+        return dict(zip(images, results))
@@ -5,14 +5,18 @@ import argparse
 from robotdevenv.ssh import RobotDevSSHHandler as SSHHandler
 from robotdevenv.git import RobotDevGitHandler as GitHandler
 from robotdevenv.singleton import Singleton
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
 
 from robotdevenv.constants import DEV_ENV_PATH
 from robotdevenv.constants import REMOTE_HOST_WORKSPACES_FOLDER_NAME
 from robotdevenv.constants import FILE_ROBOTS_PATH
+from robotdevenv.constants import REMOTE_WS_PATH_CACHE_TTL
 
 
 LOCALHOST_DEFAULT_PLATFORM = 'x86_64'
 
+host_ws_path_cache = LocalCache('host_ws_paths', ttl=REMOTE_WS_PATH_CACHE_TTL)
+
 
 class RobotDevRobotError(Exception): pass
 
@@ -36,6 +40,7 @@ class RobotDevRobot(Singleton):
 
         if is_local:
             platform = LOCALHOST_DEFAULT_PLATFORM
+            address = name
         else:
             try:
                 with open(FILE_ROBOTS_PATH, 'r') as file:
@@ -60,12 +65,35 @@ class RobotDevRobot(Singleton):
                     f'Field \'{field}\' not found for robot \'{name}\' in '
                     f'file \'{FILE_ROBOTS_PATH}\'.'
                 )
+
+            # Address of the robot for the other robots, it defaults to the
+            # SSH host alias
+            address = robot_host_info.get('address', name)
         
         # Public attributes
         self.ssh_handler = SSHHandler(name)
         self.name = name
         self.is_local = is_local
         self.platform = platform
+        self.address = address
+
+        # Private attributes
+        self.__host_ws_path = None
+
+
+    @classmethod
+    def get_singleton_key(cls,
+                parser:argparse.ArgumentParser,
+                name:str,
+                **_,
+            ):
+        # The name is read without adding the argument to 'parser', the
+        # parser of a new instance reports a missing '--robot'
+        if parser is not None:
+            robot_parser = argparse.ArgumentParser(add_help=False)
+            robot_parser.add_argument('-r', '--robot', type=str)
+            name = robot_parser.parse_known_args()[0].robot
+        return name
 
 
     def get_remote_home(self) -> pathlib.Path:
@@ -81,10 +109,31 @@ class RobotDevRobot(Singleton):
         return GitHandler.get_email().split('@')[0]
 
 
-    def get_host_ws_path(self):
+    def __get_host_ws_path_cache_key(self):
+        return f'{self.name}:{GitHandler.get_email()}'
+
+
+    def get_host_ws_path(self) -> pathlib.Path:
         if self.is_local:
             return DEV_ENV_PATH
-        else:
-            return self.get_remote_home() / \
-                   REMOTE_HOST_WORKSPACES_FOLDER_NAME / \
-                   self.get_default_ws_name()
+
+        if self.__host_ws_path is not None:
+            return self.__host_ws_path
+
+        cache_key = self.__get_host_ws_path_cache_key()
+        cached_path = host_ws_path_cache.get(cache_key)
+        if cached_path is not None:
+            self.__host_ws_path = pathlib.Path(cached_path)
+            return self.__host_ws_path
+
+        self.__host_ws_path = self.get_remote_home() / \
+            REMOTE_HOST_WORKSPACES_FOLDER_NAME / \
+            self.get_default_ws_name()
+        host_ws_path_cache.set(cache_key, str(self.__host_ws_path))
+        return self.__host_ws_path
+
+
+    def invalidate_host_ws_path(self):
+        self.__host_ws_path = None
+        if not self.is_local:
+            host_ws_path_cache.invalidate(self.__get_host_ws_path_cache_key())
@@ -0,0 +1,98 @@
+import pathlib
+
+from robotdevenv.component import RobotDevComponent as Component
+from robotdevenv.robot import RobotDevRobot as Robot
+from robotdevenv.singleton import Singleton
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+from robotdevenv.digest import RobotDevTreeDigest as TreeDigest
+from robotdevenv.digest import get_manifest_digest
+from robotdevenv.ros_packages import RobotDevROSPackageIndex as PackageIndex
+
+from robotdevenv.constants import LOCAL_SRC_PATH
+
+
+built_packages_cache = LocalCache('built_ros_pkgs')
+
+
+class RobotDevROSBuildError(Exception): pass
+
+
+class RobotDevROSBuildSelector(Singleton):
+
+    def __init__(self,
+                component:Component,
+                robot:Robot,
+            ):
+        self.__component = component
+        self.__robot = robot
+
+
+    @classmethod
+    def get_singleton_key(cls, component:Component, robot:Robot, **_):
+        return (component.full_name, robot.name)
+
+
+    def __get_built_key(self):
+        # The build folder belongs to a workspace of the robot
+        return (
+            f'{self.__robot.name}:{self.__robot.get_host_ws_path()}:'
+            f'{self.__component.full_name}'
+        )
+
+
+    def __get_packages(self) -> dict:
+        packages = {}
+        for repo_name in self.__component.src:
+            repo_packages = \
+                PackageIndex().get_packages_in(LOCAL_SRC_PATH / repo_name)
+            for name, package in repo_packages.items():
+                if name in packages:
+                    raise RobotDevROSBuildError(
+                        f'Duplicated ROS package \'{name}\' in '
+                        f'\'{packages[name]["path"]}\' and '
+                        f'\'{package["path"]}\'.'
+                    )
+                packages[name] = package
+        return packages
+
+
+    def get_packages_digests(self) -> dict:
+        packages = self.__get_packages()
+        digests = {}
+        for name in self.__component.ros_pkgs:
+            if name not in packages:
+                raise RobotDevROSBuildError(
+                    f'ROS package \'{name}\' not found in the sources of '
+                    f'component \'{self.__component.full_name}\'.'
+                )
+            tree_digest = TreeDigest(
+                root_path=pathlib.Path(packages[name]['path']),
+                cache_name=f'ros_pkgs/{name}',
+            )
+            digests[name] = get_manifest_digest(tree_digest.get_manifest())
+        return digests
+
+
+    def select_packages(self, digests:dict) -> tuple:
+        # Returns the packages to build, the changed ones plus the ones that
+        # depend on them in build order, and the changed ones
+        built_digests = built_packages_cache.get(self.__get_built_key(), {})
+        changed = {
+            name for name, digest in digests.items()
+            if built_digests.get(name) != digest
+        }
+        dependents = PackageIndex().get_reverse_dependencies(changed)
+        selected = changed | (dependents & set(self.__component.ros_pkgs))
+        return (
+            PackageIndex().get_topological_order([
+                name for name in self.__component.ros_pkgs if name in selected
+            ]),
+            [name for name in self.__component.ros_pkgs if name in changed],
+        )
+
+
+    def record_build(self, digests:dict):
+        built_key = self.__get_built_key()
+        built_digests = built_packages_cache.get(built_key, {})
+        built_digests.update(digests)
+        built_packages_cache.set(built_key, built_digests)
@@ -0,0 +1,269 @@
+import os
+import pathlib
+import threading
+import lxml.etree
+
+from robotdevenv.singleton import Singleton
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+
+from robotdevenv.constants import LOCAL_SRC_PATH
+
+
+PACKAGE_XML_FILE_NAME = 'package.xml'
+PACKAGE_XML_BUILD_DEPENDENCY_TAGS = [
+    'depend',
+    'build_depend',
+    'build_export_depend',
+    'buildtool_depend',
+]
+PACKAGE_XML_EXEC_DEPENDENCY_TAGS = [
+    'depend',
+    'exec_depend',
+]
+PACKAGES_SEARCH_IGNORED_FOLDERS = ['components', 'build', 'install', 'log']
+
+
+class RobotDevROSPackagesError(Exception): pass
+
+
+def __get_dependencies(root, tags:list) -> list:
+    dependencies = []
+    for tag in tags:
+        for element in root.findall(tag):
+            if element.text and (element.text.strip() not in dependencies):
+                dependencies.append(element.text.strip())
+    return dependencies
+
+
+def parse_package_xml(package_xml_path:pathlib.Path) -> dict:
+    try:
+        root = lxml.etree.parse(str(package_xml_path)).getroot()
+    except (OSError, lxml.etree.XMLSyntaxError) as e:
+        raise RobotDevROSPackagesError(
+            f'Could not parse \'{package_xml_path}\': {e}'
+        )
+
+    name = root.findtext('name')
+    if not name:
+        raise RobotDevROSPackagesError(
+            f'Package name not found in \'{package_xml_path}\'.'
+        )
+
+    build_dependencies = __get_dependencies(
+        root, PACKAGE_XML_BUILD_DEPENDENCY_TAGS
+    )
+    exec_dependencies = __get_dependencies(
+        root, PACKAGE_XML_EXEC_DEPENDENCY_TAGS
+    )
+
+    return {
+        'name': name.strip(),
+        'version': (root.findtext('version') or '').strip(),
+        'path': str(package_xml_path.parent),
+        'build_dependencies': build_dependencies,
+        'exec_dependencies': exec_dependencies,
+        'dependencies': build_dependencies + [
+            dependency for dependency in exec_dependencies
+            if dependency not in build_dependencies
+        ],
+    }
+
+
+class RobotDevROSPackageIndex(Singleton):
+
+    def __init__(self,
+                root_path:pathlib.Path=LOCAL_SRC_PATH,
+            ):
+        self.root_path = root_path
+        self.__cache = LocalCache(
+            f'ros_packages_index/{str(root_path).strip("/").replace("/", ".")}'
+        )
+        self.__lock = threading.Lock()
+        self.__packages = None
+        self.__all_packages = None
+
+
+    @classmethod
+    def get_singleton_key(cls, root_path:pathlib.Path, **_):
+        return str(root_path)
+
+
+    def __scan(self, folders:dict, package_files:dict) -> tuple:
+        # Folders are only listed again if their mtime changed, and
+        # 'package.xml' files are only parsed again if their mtime changed.
+        # Packages are not searched inside other packages, hidden folders or
+        # folders with a COLCON_IGNORE file, like colcon does.
+        new_folders = {}
+        new_package_files = {}
+        changed = False
+        pending = [str(self.root_path)]
+        while pending:
+            folder = pending.pop()
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                changed = True
+                continue
+
+            entry = folders.get(folder)
+            if (entry is None) or (entry['mtime'] != mtime):
+                changed = True
+                names = os.listdir(folder)
+                entry = {
+                    'mtime': mtime,
+                    'is_package': PACKAGE_XML_FILE_NAME in names,
+                    'subfolders': [] if 'COLCON_IGNORE' in names else sorted(
+                        name for name in names
+                        if (not name.startswith('.')) and
+                            (name not in PACKAGES_SEARCH_IGNORED_FOLDERS) and
+                            os.path.isdir(os.path.join(folder, name))
+                    ),
+                }
+            new_folders[folder] = entry
+
+            if entry['is_package']:
+                package_xml_path = os.path.join(folder, PACKAGE_XML_FILE_NAME)
+                try:
+                    xml_mtime = os.stat(package_xml_path).st_mtime_ns
+                except FileNotFoundError:
+                    changed = True
+                    continue
+                package_file = package_files.get(package_xml_path)
+                if (package_file is None) or \
+                        (package_file['mtime'] != xml_mtime):
+                    changed = True
+                    package_file = {
+                        'mtime': xml_mtime,
+                        'package': parse_package_xml(
+                            pathlib.Path(package_xml_path)
+                        ),
+                    }
+                new_package_files[package_xml_path] = package_file
+            else:
+                pending += [
+                    os.path.join(folder, name) for name in entry['subfolders']
+                ]
+
+        changed = changed or (len(new_package_files) != len(package_files))
+        return new_folders, new_package_files, changed
+
+
+    def refresh(self):
+        with self.__lock:
+            folders, package_files, changed = self.__scan(
+                self.__cache.get('folders', {}),
+                self.__cache.get('package_files', {}),
+            )
+            if changed:
+                self.__cache.set('folders', folders)
+                self.__cache.set('package_files', package_files)
+
+            # Duplicated names (e.g. a fork next to the original repo) only
+            # fail the queries that include both, the workspace-wide ones
+            # use the first package by path
+            all_packages = sorted(
+                (package_file['package']
+                    for package_file in package_files.values()),
+                key=lambda package: package['path'],
+            )
+            packages = {}
+            for package in all_packages:
+                if package['name'] in packages:
+                    print(
+                        f'⚠️  Duplicated ROS package \'{package["name"]}\' in '
+                        f'\'{packages[package["name"]]["path"]}\' and '
+                        f'\'{package["path"]}\', using the first one.'
+                    )
+                    continue
+                packages[package['name']] = package
+            self.__packages = packages
+            self.__all_packages = all_packages
+
+
+    def get_packages(self) -> dict:
+        if self.__packages is None:
+            self.refresh()
+        return self.__packages
+
+
+    def get_package(self, name:str) -> dict:
+        try:
+            return self.get_packages()[name]
+        except KeyError:
+            raise RobotDevROSPackagesError(
+                f'ROS package \'{name}\' not found in \'{self.root_path}\'.'
+            )
+
+
+    def get_packages_in(self, path:pathlib.Path) -> dict:
+        if self.__all_packages is None:
+            self.refresh()
+        packages = {}
+        for package in self.__all_packages:
+            if not pathlib.Path(package['path']).is_relative_to(path):
+                continue
+            if package['name'] in packages:
+                raise RobotDevROSPackagesError(
+                    f'Duplicated ROS package \'{package["name"]}\' in '
+                    f'\'{packages[package["name"]]["path"]}\' and '
+                    f'\'{package["path"]}\'.'
+                )
+            packages[package['name']] = package
+        return packages
+
+
+    def get_reverse_dependencies(self, names:set) -> set:
+        # Packages that depend, directly or not, on any package in 'names'
+        dependents = {}
+        for package in self.get_packages().values():
+            for dependency in package['dependencies']:
+                dependents.setdefault(dependency, set()).add(package['name'])
+
+        reverse_dependencies = set()
+        pending = list(names)
+        while pending:
+            for dependent in dependents.get(pending.pop(), set()):
+                if dependent not in reverse_dependencies:
+                    reverse_dependencies.add(dependent)
+                    pending.append(dependent)
+        return reverse_dependencies - set(names)
+
+
+    def get_topological_order(self, names:list=None) -> list:
+        # Dependencies go before the packages that depend on them. Only the
+        # dependencies between packages in 'names' are considered.
+        packages = self.get_packages()
+        if names is None:
+            names = sorted(packages)
+        names_set = set(names)
+        for name in names:
+            if name not in packages:
+                raise RobotDevROSPackagesError(
+                    f'ROS package \'{name}\' not found in '
+                    f'\'{self.root_path}\'.'
+                )
+
+        pending_dependencies = {
+            name: {
+                dependency for dependency in packages[name]['dependencies']
+                if (dependency in names_set) and (dependency != name)
+            }
+            for name in names
+        }
+        order = []
+        ready = [name for name in names if not pending_dependencies[name]]
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for other in names:
+                if name in pending_dependencies[other]:
+                    pending_dependencies[other].discard(name)
+                    if not pending_dependencies[other]:
+                        ready.append(other)
+
+        if len(order) != len(names):
+            raise RobotDevROSPackagesError(
+                'Circular dependency between ROS packages: '
+                f'{", ".join(sorted(names_set - set(order)))}'
+            )
+        return order
@@ -9,6 +9,7 @@ from robotdevenv.docker import RobotDevDockerHandler as DockerHandler
 from robotdevenv.singleton import Singleton
 from robotdevenv.git import RobotDevGitHandler
 from robotdevenv.docker import BuildImageType
+from robotdevenv.registry import split_image_reference
 
 from robotdevenv.constants import DEV_ENV_PATH
 from robotdevenv.constants import FOLDER_CONFIG
@@ -17,6 +18,8 @@ from robotdevenv.constants import ROBOT_CONFIG_PATH
 from robotdevenv.constants import ROBOT_COMMANDS_PATH
 from robotdevenv.constants import FOLDER_COMMANDS
 from robotdevenv.constants import GLOBAL_CONFIG_PATH
+from robotdevenv.constants import ROBOT_CCACHE_PATH
+from robotdevenv.constants import CCACHE_MAX_SIZE
 
 
 class RobotDevRunError(Exception): pass
@@ -33,6 +36,11 @@ class RobotDevRunHandler(Singleton):
         self.docker_handler = DockerHandler(self.component, self.robot)
 
 
+    @classmethod
+    def get_singleton_key(cls, component:Component, robot:Robot, **_):
+        return (component.full_name, robot.name)
+
+
     def __update_env_from_file(self,
                 env_vars: dict,
                 path_env_file: pathlib.Path,
@@ -46,12 +54,97 @@ class RobotDevRunHandler(Singleton):
                     env_vars[key] = value
 
 
+    def __get_ccache_env_vars(self) -> dict:
+        return {
+            'CCACHE_DIR': ROBOT_CCACHE_PATH,
+            'CCACHE_MAXSIZE': CCACHE_MAX_SIZE,
+        }
+
+
+    def __get_container_config(self,
+                config_origin:str,
+                build_type:BuildImageType,
+                ccache=False,
+            ) -> tuple:
+        # Config folder definition
+        config_path_global = GLOBAL_CONFIG_PATH
+        config_localpath_devenv = DEV_ENV_PATH / FOLDER_CONFIG
+
+        if self.robot.is_local:
+            config_path_devenv = config_localpath_devenv
+        else:
+            config_path_devenv = self.robot.get_host_ws_path() / FOLDER_CONFIG
+
+        if config_origin=='devenv':
+            if not config_localpath_devenv.is_dir():
+                raise RobotDevRunError(
+                    f'Configuration folder not found in development '
+                    'environment root folder'
+                )
+            config_path=config_path_devenv
+            print(
+                '⚙️  Using configuration folder from development environment:'
+            )
+        else: # global
+            config_path=config_path_global
+            print('⚙️  Using global configuration folder:')
+        print(f'   - {config_path}')
+        print()
+
+        # Env Definition
+        env_vars_from_files = {}
+        env_files_paths = []
+
+        local_env_path = DEV_ENV_PATH / FOLDER_CONFIG / 'env'
+        if local_env_path.is_file():
+            env_files_paths.append(local_env_path)
+            self.__update_env_from_file(env_vars_from_files, local_env_path)
+
+        print('🌎 Using env files:')
+        for env_file_path in env_files_paths:
+            print(f'  - {env_file_path}')
+        print()
+
+        env_vars = {
+            'IDHOST': self.robot.name,
+            'IDCOMPONENT': self.component.name,
+            'PLATFORM': self.robot.platform,
+            'ROBOT_NAME': ROBOT_NAME,
+            'REPO_NAME': self.component.repo_name,
+            'COMPONENT_NAME': self.component.name,
+            'REPO_METADATA': f'\'{json.dumps(self.component.repo_manifest)}\'',
+            'COMPONENT_METADATA': f'\'{json.dumps(self.component.component_desc)}\'',
+        }
+        env_vars['ROS_DOMAIN_ID'] = 0
+
+        if ccache:
+            env_vars.update(self.__get_ccache_env_vars())
+
+        # Volumes
+        volumes = self.component.get_volumes(
+            build_type=build_type,
+            ccache=ccache,
+        )
+        volumes.append(
+            (config_path, ROBOT_CONFIG_PATH, 'ro')
+        )
+
+        if (self.component.local_path / FOLDER_COMMANDS).is_dir():
+            volumes.append(
+                (self.component.host_path / FOLDER_COMMANDS, ROBOT_COMMANDS_PATH)
+            )
+
+        return env_files_paths, env_vars, volumes
+
+
     def run_command(self,
                 command:str,
                 interactive=False,
                 detached_mode=False,
                 config_origin=None,
                 build_type=BuildImageType.DEVEL, 
+                warm=False,
+                ccache=False,
             ):
         
         if config_origin is not None and \
@@ -60,95 +153,72 @@ class RobotDevRunHandler(Singleton):
                 f'Configuration origin \'{config_origin}\' not valid.'
             )
         
+        # All the checks use the same snapshot of the containers in the host
+        containers = self.docker_handler.get_containers_snapshot()
+
         # Check if there is a container running the base image (same component)
-        containers_info = \
-            self.docker_handler.get_running_containers_and_images()
         if build_type == BuildImageType.DEVEL:
             base_name = self.component.image_name_dev
         else:
             base_name = self.component.image_name_prod
-        base_image_name = base_name.split(':')[0].strip()
-        base_tag_name = base_name.split(':')[1].strip()
-
-        for info in containers_info:
-            image_name = info[1]
-            tag_name = info[2]
-            if (image_name==base_image_name) and (base_tag_name!=tag_name):
-                container_name = info[0]
+        base_image_name, base_tag_name = split_image_reference(base_name)
+
+        # An outdated warm container is recreated, so it is not a conflict
+        warm_container_name = self.docker_handler.get_warm_container_name()
+        for info in containers.values():
+            if warm and (info.name == warm_container_name):
+                continue
+            if (info.image_name==base_image_name) and (base_tag_name!=info.tag):
                 raise RobotDevRunError(
-                    f'Component \'{image_name}\' already running in the container \'{container_name}\' with the tag \'{tag_name}\''
+                    f'Component \'{info.image_name}\' already running in the container \'{info.name}\' with the tag \'{info.tag}\''
                 )
         
-        container_info = self.docker_handler.get_running_container_info()
+        container_info = containers.get(self.component.container_name)
 
-        if container_info is None:
-            # The container does not exist
+        # Stopped containers are reused only to be started detached, in any
+        # other case they are replaced by a new one
+        if (container_info is not None) and (not container_info.running):
+            if not detached_mode:
+                self.docker_handler.remove_container()
+                del containers[container_info.name]
+            container_info = None
 
-            # Config folder definition
-            config_path_global = GLOBAL_CONFIG_PATH
-            config_localpath_devenv = DEV_ENV_PATH / FOLDER_CONFIG
+        if (container_info is None) and warm and (not detached_mode):
+            # Commands go to the warm container, created if it is needed
+            env_files_paths, env_vars, volumes = \
+                self.__get_container_config(config_origin, build_type)
 
-            if self.robot.is_local:
-                config_path_devenv = config_localpath_devenv
+            # The compiler cache is always in the dev warm container, so
+            # commands with and without it share the same container
+            if build_type == BuildImageType.DEVEL:
+                shared_volumes = [self.component.get_ccache_volume()]
+                shared_env_vars = self.__get_ccache_env_vars()
             else:
-                config_path_devenv = self.robot.get_host_ws_path() / FOLDER_CONFIG
-
-            if config_origin=='devenv':
-                if not config_localpath_devenv.is_dir():
-                    raise RobotDevRunError(
-                        f'Configuration folder not found in development '
-                        'environment root folder'
-                    )
-                config_path=config_path_devenv
-                print(
-                    '⚙️  Using configuration folder from development environment:'
-                )
-            else: # global
-                config_path=config_path_global
-                print('⚙️  Using global configuration folder:')
-            print(f'   - {config_path}')
-            print()
-
-            # Env Definition
-            env_vars_from_files = {}
-            env_files_paths = []
-
-            local_env_path = DEV_ENV_PATH / FOLDER_CONFIG / 'env'
-            if local_env_path.is_file():
-                env_files_paths.append(local_env_path)
-                self.__update_env_from_file(env_vars_from_files, local_env_path)
-
-            print('🌎 Using env files:')
-            for env_file_path in env_files_paths:
-                print(f'  - {env_file_path}')
-            print()
-
-            env_vars = {
-                'IDHOST': self.robot.name,
-                'IDCOMPONENT': self.component.name,
-                'PLATFORM': self.robot.platform,
-                'ROBOT_NAME': ROBOT_NAME,
-                'REPO_NAME': self.component.repo_name,
-                'COMPONENT_NAME': self.component.name,
-                'REPO_METADATA': f'\'{json.dumps(self.component.repo_manifest)}\'',
-                'COMPONENT_METADATA': f'\'{json.dumps(self.component.component_desc)}\'',
-            }
-            env_vars['ROS_DOMAIN_ID'] = 0
-
-            # Volumes
-            volumes = self.component.get_volumes(
+                shared_volumes, shared_env_vars = [], {}
+
+            self.docker_handler.ensure_warm_container(
+                env_files=env_files_paths,
+                env_vars=env_vars,
+                volumes=volumes,
                 build_type=build_type,
+                containers=containers,
+                shared_volumes=shared_volumes,
+                shared_env_vars=shared_env_vars,
             )
-            volumes.append(
-                (config_path, ROBOT_CONFIG_PATH, 'ro')
+            return self.docker_handler.exec_warm_command(
+                command=command,
+                interactive=interactive,
+                build_type=build_type,
             )
 
-            if (self.component.local_path / FOLDER_COMMANDS).is_dir():
-                volumes.append(
-                    (self.component.host_path / FOLDER_COMMANDS, ROBOT_COMMANDS_PATH)
+        elif container_info is None:
+            # The container does not exist
+            env_files_paths, env_vars, volumes = \
+                self.__get_container_config(
+                    config_origin, build_type, ccache=ccache,
                 )
 
-            self.docker_handler.run_command(
+            return self.docker_handler.run_command(
                 command=command,
                 env_files=env_files_paths,
                 env_vars=env_vars,
@@ -156,6 +226,7 @@ class RobotDevRunHandler(Singleton):
                 interactive=interactive,
                 detached_mode=detached_mode,
                 build_type=build_type,
+                containers=containers,
             )
 
         else:
@@ -166,11 +237,30 @@ class RobotDevRunHandler(Singleton):
                 f'ℹ️  Container \'{self.component.container_name}\' already running, '
                 f'executing \'{command}\' inside it\n'
             )
-            self.docker_handler.exec_command(
+            return self.docker_handler.exec_command(
                 command=command, 
                 interactive=interactive,
                 build_type=build_type,
             )
 
 
+    def prepare_container(self,
+                command:str,
+                config_origin=None,
+                build_type=BuildImageType.DEVEL,
+            ):
+        # Creates the detached container in advance, so a later detached
+        # run only starts it
+        env_files_paths, env_vars, volumes = \
+            self.__get_container_config(config_origin, build_type)
+
+        self.docker_handler.prepare_container(
+            command=command,
+            env_files=env_files_paths,
+            env_vars=env_vars,
+            volumes=volumes,
+            build_type=build_type,
+        )
+
+
     # def run_production_container(self):
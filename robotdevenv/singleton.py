@@ -1,8 +1,42 @@
-class Singleton:
+import inspect
+import threading
+
+
+class SingletonMeta(type):
     _instances = {}
+    _creation_locks = {}
+    _lock = threading.Lock()
+
+    def __call__(cls, *args, **kwargs):
+        # The key comes from the constructor arguments, so '__init__' only
+        # runs for new instances. The class lock only guards the lookups,
+        # instances with different keys are created concurrently.
+        arguments = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+        arguments.apply_defaults()
+        del arguments.arguments[next(iter(arguments.arguments))]
+        key = (cls, cls.get_singleton_key(**arguments.arguments))
+
+        with cls._lock:
+            instance = cls._instances.get(key)
+            if instance is not None:
+                return instance
+            creation_lock = cls._creation_locks.setdefault(
+                key, threading.RLock()
+            )
+
+        with creation_lock:
+            with cls._lock:
+                instance = cls._instances.get(key)
+            if instance is None:
+                instance = super().__call__(*args, **kwargs)
+                with cls._lock:
+                    cls._instances[key] = instance
+                    del cls._creation_locks[key]
+        return instance
+
+
+class Singleton(metaclass=SingletonMeta):
 
-    def __new__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            instance = super().__new__(cls)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+    @classmethod
+    def get_singleton_key(cls, **arguments):
+        return None
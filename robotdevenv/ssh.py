@@ -1,8 +1,16 @@
+import os
+import atexit
 import pathlib
+import tempfile
+import threading
 import subprocess
 
 from robotdevenv.singleton import Singleton
 
+from robotdevenv.constants import SSH_CONTROL_FOLDER_NAME
+from robotdevenv.constants import SSH_CONTROL_PERSIST
+from robotdevenv.constants import REMOTE_DOCKER_SOCKET_PATH
+
 
 class RobotDevSSHError(Exception): pass
 class RobotDevRSyncError(Exception): pass
@@ -13,7 +21,123 @@ class RobotDevSSHHandler(Singleton):
     def __init__(self,
                 host_alias:str,
             ):
+        # Unix sockets paths are limited to ~100 chars, so the control
+        # sockets live in the temp folder instead of the dev env folder.
+        control_folder = pathlib.Path(tempfile.gettempdir()) / \
+            f'{SSH_CONTROL_FOLDER_NAME}.{os.getuid()}'
+        control_path = control_folder / f'{host_alias}.{os.getpid()}.ssh'
+        docker_socket_path = \
+            control_folder / f'{host_alias}.{os.getpid()}.docker.sock'
+
         self.__host_alias = host_alias
+        self.__control_folder = control_folder
+        self.__control_path = control_path
+        self.__docker_socket_path = docker_socket_path
+        self.__master_running = False
+        self.__docker_forwarded = False
+        self.__lock = threading.Lock()
+
+
+    @classmethod
+    def get_singleton_key(cls, host_alias:str, **_):
+        return host_alias
+
+
+    def __is_master_running(self):
+        if not self.__control_path.exists():
+            return False
+        process = subprocess.run(
+            ['ssh', '-S', str(self.__control_path), '-O', 'check',
+                self.__host_alias],
+            capture_output=True,
+        )
+        return process.returncode == 0
+
+
+    def __ensure_master(self):
+        with self.__lock:
+            self.__open_master()
+
+
+    def __open_master(self):
+        # The master exits by itself after being idle for SSH_CONTROL_PERSIST
+        if self.__master_running and self.__control_path.exists():
+            return
+
+        if not self.__is_master_running():
+            self.__control_folder.mkdir(mode=0o700, exist_ok=True)
+            # The master goes to background (-f), so its stderr can not be a
+            # pipe or the call would wait until the master exits.
+            with tempfile.TemporaryFile() as stderr_file:
+                process = subprocess.run(
+                    [
+                        'ssh', '-M', '-N', '-f',
+                        '-S', str(self.__control_path),
+                        '-o', f'ControlPersist={SSH_CONTROL_PERSIST}',
+                        '-o', 'StreamLocalBindUnlink=yes',
+                        '-o', 'ServerAliveInterval=15',
+                        self.__host_alias,
+                    ],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr_file,
+                )
+                if process.returncode != 0:
+                    stderr_file.seek(0)
+                    raise RobotDevSSHError(
+                        f'Could not open SSH connection to '
+                        f'\'{self.__host_alias}\': '
+                        f'{stderr_file.read().decode().strip()}'
+                    )
+
+        if not self.__master_running:
+            atexit.register(self.close)
+        self.__master_running = True
+        self.__docker_forwarded = False
+
+
+    def get_ssh_command(self) -> str:
+        self.__ensure_master()
+        return f'ssh -S {self.__control_path}'
+
+
+    def get_docker_host(self) -> str:
+        self.__ensure_master()
+
+        with self.__lock:
+            self.__forward_docker_socket()
+
+        return f'unix://{self.__docker_socket_path}'
+
+
+    def __forward_docker_socket(self):
+        if not self.__docker_forwarded:
+            self.__docker_socket_path.unlink(missing_ok=True)
+            process = subprocess.run(
+                [
+                    'ssh', '-S', str(self.__control_path), '-O', 'forward',
+                    '-L', f'{self.__docker_socket_path}:'
+                        f'{REMOTE_DOCKER_SOCKET_PATH}',
+                    self.__host_alias,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode != 0:
+                raise RobotDevSSHError(process.stderr)
+            self.__docker_forwarded = True
+
+
+    def close(self):
+        if self.__control_path.exists():
+            subprocess.run(
+                ['ssh', '-S', str(self.__control_path), '-O', 'exit',
+                    self.__host_alias],
+                capture_output=True,
+            )
+        self.__docker_socket_path.unlink(missing_ok=True)
+        self.__master_running = False
+        self.__docker_forwarded = False
 
 
     def run_remote(self,
@@ -22,7 +146,7 @@ class RobotDevSSHHandler(Singleton):
                 print_output:bool=False,
                 force_bash:bool=False,
             ):
-        local_command = f'ssh {self.__host_alias} '
+        local_command = f'{self.get_ssh_command()} {self.__host_alias} '
         
         if force_bash:
             local_command += f'"bash -c \\"{command}\\""'
@@ -49,10 +173,61 @@ class RobotDevSSHHandler(Singleton):
     def sync_to_remote(self,
                 origin_path:pathlib.Path,
                 destination_path:pathlib.Path,
+                copy_dest_path:pathlib.Path=None,
             ):
         rsync_command = (
             'rsync '
+            f'--rsh \'{self.get_ssh_command()}\' '
             '--checksum --archive --verbose --stats --delete '
+        )
+        # Unchanged files found in 'copy_dest_path' are copied in the remote
+        if copy_dest_path is not None:
+            rsync_command += f'--copy-dest={copy_dest_path} '
+        rsync_command += (
+            f'{origin_path} '
+            f'{self.__host_alias}:{destination_path}'
+        )
+        res = subprocess.run(
+                rsync_command, shell=True, capture_output=True, text=True
+            )
+        if res.returncode!=0:
+            raise RobotDevRSyncError(res.stderr)
+
+
+    def sync_paths_to_remote(self,
+                origin_path:pathlib.Path,
+                destination_path:pathlib.Path,
+                relative_paths:list,
+            ):
+        # Paths missing in the origin are deleted in the destination
+        rsync_command = (
+            'rsync '
+            f'--rsh \'{self.get_ssh_command()}\' '
+            '--archive --from0 --files-from=- --delete-missing-args '
+            f'{origin_path}/ '
+            f'{self.__host_alias}:{destination_path}/'
+        )
+        res = subprocess.run(
+                rsync_command,
+                shell=True,
+                capture_output=True,
+                text=True,
+                input='\0'.join(relative_paths),
+            )
+        if res.returncode!=0:
+            raise RobotDevRSyncError(res.stderr)
+
+
+    def send_file_to_remote(self,
+                origin_path:pathlib.Path,
+                destination_path:pathlib.Path,
+            ):
+        # Interrupted transfers are kept in the remote and resumed by the
+        # next call, as long as the origin file did not change
+        rsync_command = (
+            'rsync '
+            f'--rsh \'{self.get_ssh_command()}\' '
+            '--partial --append-verify '
             f'{origin_path} '
             f'{self.__host_alias}:{destination_path}'
         )
@@ -61,3 +236,23 @@ class RobotDevSSHHandler(Singleton):
             )
         if res.returncode!=0:
             raise RobotDevRSyncError(res.stderr)
+
+
+    def fetch_file_from_remote(self,
+                origin_path:pathlib.Path,
+                destination_path:pathlib.Path,
+            ):
+        # Interrupted transfers are kept locally and resumed by the next
+        # call, as long as the remote file did not change
+        rsync_command = (
+            'rsync '
+            f'--rsh \'{self.get_ssh_command()}\' '
+            '--partial --append-verify '
+            f'{self.__host_alias}:{origin_path} '
+            f'{destination_path}'
+        )
+        res = subprocess.run(
+                rsync_command, shell=True, capture_output=True, text=True
+            )
+        if res.returncode!=0:
+            raise RobotDevRSyncError(res.stderr)
@@ -1,13 +1,28 @@
+import time
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 from robotdevenv.component import RobotDevComponent as Component
 from robotdevenv.robot import RobotDevRobot as Robot
 from robotdevenv.singleton import Singleton
+from robotdevenv.ssh import RobotDevSSHError as SSHError
+from robotdevenv.ssh import RobotDevRSyncError as RSyncError
+from robotdevenv.cache import RobotDevLocalCache as LocalCache
+from robotdevenv.digest import RobotDevTreeDigest as TreeDigest
+from robotdevenv.digest import RobotDevDigestError as DigestError
+from robotdevenv.digest import get_manifest_digest
+from robotdevenv.digest import get_manifest_changes
+from robotdevenv.inotify import RobotDevInotifyWatcher as InotifyWatcher
+from robotdevenv.inotify import RobotDevInotifyError as InotifyError
 
 from robotdevenv.constants import DEV_ENV_PATH
 from robotdevenv.constants import FOLDER_SRC
 from robotdevenv.constants import FOLDER_CONFIG
 from robotdevenv.constants import LOCAL_SRC_PATH
+from robotdevenv.constants import SYNC_DEFAULT_MAX_WORKERS
+from robotdevenv.constants import SYNC_REMOTE_DIGESTS_FOLDER_NAME
+from robotdevenv.constants import SYNC_WATCH_DEBOUNCE
 
 
 class RobotDevSyncError(Exception): pass
@@ -21,45 +36,261 @@ class RobotDevSyncHandler(Singleton):
             ):
         self.__component = component
         self.__robot = robot
+        self.__synced_manifests = \
+            LocalCache(f'synced_manifests/{self.__robot.name}')
 
 
-    def sync_to_robot(self):
-        print(f'🔁💻 Synchronizing to remote host \'{self.__robot.name}\'...')
-        print()
+    @classmethod
+    def get_singleton_key(cls, component:Component, robot:Robot, **_):
+        return (component.full_name, robot.name)
 
-        remote_ws_path = self.__robot.get_host_ws_path()
 
-        # Repositories
-        print(f'  ➡️  Creating remote repos path ... ', end='')
+    def __get_tree_key(self, name:str):
+        return name.replace('/', '.')
+
+
+    def __get_remote_digests(self, remote_ws_path:pathlib.Path):
+        digests_path = remote_ws_path / SYNC_REMOTE_DIGESTS_FOLDER_NAME
+        command_output:str = self.__robot.ssh_handler.run_remote(
+            command=f'"grep -rH . {digests_path} 2>/dev/null || true"',
+            get_output=True,
+        )
+        remote_digests = {}
+        for line in command_output.splitlines():
+            path, _, digest = line.rpartition(':')
+            remote_digests[pathlib.Path(path).name] = digest.strip()
+        return remote_digests
+
+
+    def __invalidate_digests(self,
+                remote_ws_path:pathlib.Path,
+                names:list,
+            ):
+        # Transfers that do not go through the digests leave the remote
+        # digests and the synced manifests outdated, so they are removed
+        # before the transfer and the next digest sync checks the trees
+        tree_keys = [self.__get_tree_key(name) for name in names]
+        digests_path = remote_ws_path / SYNC_REMOTE_DIGESTS_FOLDER_NAME
+        self.__robot.ssh_handler.run_remote(
+            f'"rm -f {" ".join(f"{digests_path}/{key}" for key in tree_keys)}"'
+        )
+        for tree_key in tree_keys:
+            self.__synced_manifests.invalidate(f'{remote_ws_path}:{tree_key}')
+
+
+    def __sync_tree(self,
+                name:str,
+                origin_path:pathlib.Path,
+                destination_path:pathlib.Path,
+                remote_ws_path:pathlib.Path,
+                remote_digests:dict,
+                digest_mode:bool,
+            ):
+        ssh_handler = self.__robot.ssh_handler
+
+        if not digest_mode:
+            ssh_handler.sync_to_remote(
+                origin_path=origin_path,
+                destination_path=destination_path,
+            )
+            return ''
+
+        tree_key = self.__get_tree_key(name)
+        # Fleet syncs of the same tree run concurrently, one per robot
+        manifest = TreeDigest(
+            origin_path, cache_name=f'{self.__robot.name}/{tree_key}',
+        ).get_manifest()
+        digest = get_manifest_digest(manifest)
+        remote_digest = remote_digests.get(tree_key)
+
+        if digest == remote_digest:
+            return '(unchanged, skipped)'
+
+        manifest_key = f'{remote_ws_path}:{tree_key}'
+        last_synced = self.__synced_manifests.get(manifest_key)
+
+        if (last_synced is not None) and \
+                (last_synced['digest'] == remote_digest):
+            changes = get_manifest_changes(last_synced['files'], manifest)
+            ssh_handler.sync_paths_to_remote(
+                origin_path=origin_path,
+                destination_path=destination_path / origin_path.name,
+                relative_paths=changes,
+            )
+            result = f'({len(changes)} changed paths)'
+        else:
+            ssh_handler.sync_to_remote(
+                origin_path=origin_path,
+                destination_path=destination_path,
+            )
+            result = '(full)'
+
+        digests_path = remote_ws_path / SYNC_REMOTE_DIGESTS_FOLDER_NAME
+        ssh_handler.run_remote(
+            f'"mkdir -p {digests_path} && '
+            f'echo {digest} > {digests_path}/{tree_key}"'
+        )
+        self.__synced_manifests.set(
+            manifest_key, {'digest': digest, 'files': manifest}
+        )
+
+        return result
+
+
+    def __get_transfers(self, remote_ws_path:pathlib.Path):
         remote_repos_path = remote_ws_path / FOLDER_SRC
-        self.__robot.ssh_handler.run_remote(f'mkdir -p {remote_repos_path}')
-        print('✅')
 
+        transfers = []
         for src_component in self.__component.src:
-            print(
-                f'  ➡️  Synchronizing {FOLDER_SRC}/{src_component} ... ', end=''
-            )
             origin_path:pathlib.Path = LOCAL_SRC_PATH / src_component
             if not origin_path.is_dir():
                 raise RobotDevSyncError(
                     f'Source component \'{src_component}\' does not exist. '
                     f'Folder \'{origin_path}\' not found'
                 )
-            
-            self.__robot.ssh_handler.sync_to_remote(
-                origin_path=origin_path, 
-                destination_path=remote_repos_path,
+            transfers.append(
+                (f'{FOLDER_SRC}/{src_component}', origin_path, remote_repos_path)
             )
-            
-            print('✅')
+        transfers.append(
+            (FOLDER_CONFIG, DEV_ENV_PATH/FOLDER_CONFIG, remote_ws_path)
+        )
 
-        print(f'  ➡️  Synchronizing {FOLDER_CONFIG} ... ', end='')
-        self.__robot.ssh_handler.sync_to_remote(
-                origin_path=DEV_ENV_PATH/FOLDER_CONFIG, 
-                destination_path=remote_ws_path,
-            )
+        return transfers
+
+
+    def sync_to_robot(self,
+                max_workers:int=SYNC_DEFAULT_MAX_WORKERS,
+                digest_mode:bool=False,
+            ):
+        print(f'🔁💻 Synchronizing to remote host \'{self.__robot.name}\'...')
+        print()
+
+        remote_ws_path = self.__robot.get_host_ws_path()
+
+        # Repositories
+        print(f'  ➡️  Creating remote repos path ... ', end='')
+        remote_repos_path = remote_ws_path / FOLDER_SRC
+        try:
+            self.__robot.ssh_handler.run_remote(f'mkdir -p {remote_repos_path}')
+        except SSHError:
+            # The cached workspace path may be outdated, resolve it again
+            self.__robot.invalidate_host_ws_path()
+            remote_ws_path = self.__robot.get_host_ws_path()
+            remote_repos_path = remote_ws_path / FOLDER_SRC
+            self.__robot.ssh_handler.run_remote(f'mkdir -p {remote_repos_path}')
         print('✅')
+
+        transfers = self.__get_transfers(remote_ws_path)
+
+        remote_digests = {}
+        if digest_mode:
+            remote_digests = self.__get_remote_digests(remote_ws_path)
+        else:
+            self.__invalidate_digests(
+                remote_ws_path, [name for name, _, _ in transfers]
+            )
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self.__sync_tree,
+                    name=name,
+                    origin_path=origin_path,
+                    destination_path=destination_path,
+                    remote_ws_path=remote_ws_path,
+                    remote_digests=remote_digests,
+                    digest_mode=digest_mode,
+                ): name
+                for name, origin_path, destination_path in transfers
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                    print(f'  ➡️  Synchronizing {name} ... ✅ {result}')
+                except (RSyncError, SSHError, DigestError) as e:
+                    print(f'  ➡️  Synchronizing {name} ... ❌')
+                    errors.append(f'{name}: {str(e).strip()}')
+                    # Do not start pending transfers after the first failure
+                    for pending in futures:
+                        pending.cancel()
+
+        if errors:
+            raise RobotDevSyncError(
+                'Synchronization failed:\n' + '\n'.join(errors)
+            )
         
         print()
 
-        
+
+    def watch_to_robot(self,
+                max_workers:int=SYNC_DEFAULT_MAX_WORKERS,
+                debounce:float=SYNC_WATCH_DEBOUNCE,
+            ):
+        self.sync_to_robot(max_workers=max_workers, digest_mode=True)
+
+        remote_ws_path = self.__robot.get_host_ws_path()
+        transfers = self.__get_transfers(remote_ws_path)
+
+        watcher = InotifyWatcher(
+            [origin_path for _, origin_path, _ in transfers]
+        )
+
+        print(f'👀 Watching for changes, press Ctrl+C to stop...')
+        print()
+
+        # Trees pushed since their digests were last written
+        invalidated = set()
+
+        try:
+            while True:
+                try:
+                    changes, complete = watcher.wait_changes(debounce)
+                except InotifyError as e:
+                    # The events read with the failure are lost
+                    print(f'  ⚠️  {e}')
+                    changes, complete = set(), False
+                if not complete:
+                    print('  ⚠️  Some changes may be missing, synchronizing '
+                          'everything')
+                    self.sync_to_robot(
+                        max_workers=max_workers, digest_mode=True,
+                    )
+                    invalidated.clear()
+                    continue
+
+                for name, origin_path, destination_path in transfers:
+                    relative_paths = sorted(
+                        str(path.relative_to(origin_path))
+                        for path in changes
+                        if path != origin_path and \
+                            path.is_relative_to(origin_path)
+                    )
+                    if not relative_paths:
+                        continue
+                    print(
+                        f'  ➡️  [{time.strftime("%H:%M:%S")}] Pushing '
+                        f'{len(relative_paths)} changed paths in {name} ... ',
+                        end='', flush=True,
+                    )
+                    try:
+                        if name not in invalidated:
+                            self.__invalidate_digests(remote_ws_path, [name])
+                            invalidated.add(name)
+                        self.__robot.ssh_handler.sync_paths_to_remote(
+                            origin_path=origin_path,
+                            destination_path=destination_path / origin_path.name,
+                            relative_paths=relative_paths,
+                        )
+                        print('✅')
+                    except (RSyncError, SSHError) as e:
+                        print('❌')
+                        print(f'     {str(e).strip()}')
+        except KeyboardInterrupt:
+            print()
+            print('👋 Watch mode stopped')
+        finally:
+            watcher.close()